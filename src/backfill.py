@@ -0,0 +1,162 @@
+"""
+Analyze a range of runs in one process.
+
+    python src/backfill.py --runs 8d295e14f8b6168c,cd6f705cb1aed1d0
+    python src/backfill.py --since 2025-04-01 --until 2025-04-07 --branch main --tag merge
+
+Runs are processed oldest first as consecutive pairs. Each run is downloaded
+once: it is compared against the run before it, then kept in memory as the
+"previous" run of the next pair, while the next runs are already downloading.
+One report per run and a throughput summary are written to the output directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from currents.get_project_runs import get_previous_run, get_runs_between
+from currents.get_run_details import get_run_details
+from currents.get_test_results_for_run import get_test_results_for_runs_async
+from currents.rate_limiter import rate_limiter
+from currents.response_cache import get_cache_stats
+from helpers.data.compare_test_results import compare_test_results
+from helpers.data.enrich_test_data import enrich_test_data
+from helpers.data.render_test_run_diff import render_test_run_diff, render_partial_notice
+from helpers.data.test_warehouse import set_warehouse_enabled
+
+# How many runs ahead of the pair being analyzed are downloaded
+PREFETCH_RUNS = int(os.getenv("BACKFILL_PREFETCH_RUNS", "2"))
+
+
+async def fetch_run_tests(run_id):
+    """Returns: tuple: (tests, number of instances that couldn't be downloaded)."""
+    missing = []
+    results = await get_test_results_for_runs_async(
+        [run_id], compact=True, on_instance_error=lambda run_index, instance_id, error: missing.append(instance_id)
+    )
+    return results[0], len(missing)
+
+
+def write_report(out_dir, run, previous_run, test_run_diff, missing_counts=None):
+    counts = ", ".join(f"{section}: {len(tests)}" for section, tests in test_run_diff.items())
+    header = [
+        f"Run: {run.get('runId')} ({run.get('createdAt')})",
+        f"Previous run: {previous_run.get('runId')} ({previous_run.get('createdAt')})",
+        counts,
+    ]
+    report = render_test_run_diff(test_run_diff, run) or "No changes."
+    if missing_counts:
+        report = render_partial_notice(missing_counts) + "\n\n" + report
+    path = os.path.join(out_dir, f"{run.get('runId')}.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(header) + "\n\n" + report + "\n")
+    return path
+
+
+async def backfill(runs, out_dir, tags, branches):
+    """
+    Analyze `runs` (oldest first) as a pipeline of consecutive pairs.
+
+    Returns:
+        dict: Throughput summary.
+    """
+    started_at = time.perf_counter()
+    requests_before = rate_limiter.stats()["total_requests"]
+
+    first_previous = get_previous_run(runs[0]["runId"], tags=tags, branches=branches)
+    if "error" in first_previous:
+        # Without an earlier run every test would look new, so the first run is only a baseline
+        print(f"⚠️ {first_previous['error']}, using it as the baseline")
+        first_previous, runs = runs[0], runs[1:]
+
+    downloads = {}
+
+    def start_download(run_id):
+        if run_id not in downloads:
+            downloads[run_id] = asyncio.create_task(fetch_run_tests(run_id))
+
+    start_download(first_previous["runId"])
+    previous_run = first_previous
+    previous_tests, previous_missing = await downloads.pop(first_previous["runId"])
+
+    reports = []
+    for i, run in enumerate(runs):
+        for upcoming in runs[i:i + 1 + PREFETCH_RUNS]:
+            start_download(upcoming["runId"])
+        current_tests, current_missing = await downloads.pop(run["runId"])
+        missing_counts = {run: count for run, count in (("current", current_missing), ("previous", previous_missing)) if count}
+
+        test_run_diff = compare_test_results(previous_tests, current_tests)
+        # History lookups block on the HTTP pool, so keep them off the event loop
+        # while the next runs keep downloading
+        await asyncio.to_thread(enrich_test_data, test_run_diff, run)
+        reports.append(write_report(out_dir, run, previous_run, test_run_diff, missing_counts))
+        print(f"📝 [{i + 1}/{len(runs)}] {run['runId']}: " + ", ".join(f"{len(tests)} {section}" for section, tests in test_run_diff.items()))
+
+        previous_run, previous_tests, previous_missing = run, current_tests, current_missing
+
+    elapsed = time.perf_counter() - started_at
+    total_requests = rate_limiter.stats()["total_requests"] - requests_before
+    cache_stats = get_cache_stats()
+    return {
+        "runs": len(runs),
+        "seconds": round(elapsed, 2),
+        "runsPerMinute": round(len(runs) / elapsed * 60, 2) if elapsed else None,
+        "requests": total_requests,
+        "requestsPerRun": round(total_requests / len(runs), 1) if runs else None,
+        "cacheHits": cache_stats["hits"],
+        "cacheMisses": cache_stats["misses"],
+        "reports": reports,
+    }
+
+
+def resolve_runs(args, tags, branches):
+    if args.runs:
+        runs = [get_run_details(run_id.strip()) for run_id in args.runs.split(",") if run_id.strip()]
+        for run in runs:
+            if "error" in run:
+                raise SystemExit(f"Could not load run: {run['error']}")
+        return sorted(runs, key=lambda run: run.get("createdAt") or "")
+
+    until = args.until or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    if len(until) == 10:  # a bare date includes the whole day
+        until += "T23:59:59.999Z"
+    return get_runs_between(args.since, until, tags=tags, branches=branches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--runs", help="Comma-separated run ids")
+    source.add_argument("--since", help="Earliest run date (ISO date or timestamp)")
+    parser.add_argument("--until", help="Latest run date (default: now)")
+    parser.add_argument("--branch", action="append", help="Branch to include (repeatable, default: main)")
+    parser.add_argument("--tag", action="append", help="Tag the runs must carry (repeatable, default: merge)")
+    parser.add_argument("--out", default=os.path.join("output", "backfill"), help="Directory for the reports")
+    parser.add_argument("--no-warehouse", action="store_true", help="Don't add the downloaded results to the local test warehouse (same as TEST_WAREHOUSE=off)")
+    args = parser.parse_args()
+    set_warehouse_enabled(not args.no_warehouse)
+
+    tags = args.tag or ["merge"]
+    branches = args.branch or ["main", "refs/heads/main"]
+
+    runs = resolve_runs(args, tags, branches)
+    if not runs:
+        raise SystemExit("No runs to analyze.")
+    print(f"📦 Backfilling {len(runs)} runs...")
+
+    os.makedirs(args.out, exist_ok=True)
+    summary = asyncio.run(backfill(runs, args.out, tags, branches))
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\n⏱️ {summary['runs']} runs in {summary['seconds']}s ({summary['runsPerMinute']} runs/min), "
+          f"{summary['requestsPerRun']} requests per run, {summary['cacheHits']} cache hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare parse time and peak RSS of the full `response.json()` path against the
+streaming, field-selective parser on a synthetic `/instances/{id}` body.
+
+    python src/benchmarks/bench_instance_parse.py --tests 2000 --attempts 3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from currents.parse_instance_payload import project_instance, parse_instance_stream, ijson  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def build_payload(tests, attempts, stack_lines):
+    stack = "\n".join(f"    at Object.<anonymous> (/repo/test/e2e/tests/feature_{i}.test.ts:{i}:17)" for i in range(stack_lines))
+    return json.dumps({
+        "data": {
+            "groupId": "e2e-electron",
+            "spec": "tests/console/console-python.test.ts",
+            "signature": "abc123",
+            "completedAt": "2025-04-10T10:00:00Z",
+            "results": {
+                "stats": {"tests": tests, "wallClockEndedAt": "2025-04-10T10:00:00Z"},
+                "tests": [
+                    {
+                        "title": ["Console Pane: Python", f"Python - Verify output {i}"],
+                        "testId": f"test-{i}",
+                        "state": "failed" if i % 7 == 0 else "passed",
+                        "attempts": [
+                            {
+                                "state": "failed",
+                                "error": {"message": f"Timeout 30000ms exceeded waiting for locator('#cell-{i}')", "stack": stack},
+                                "artifacts": [{"type": "trace", "path": f"/tmp/artifacts/{i}/{a}/trace.zip"}],
+                            }
+                            for a in range(attempts)
+                        ],
+                    }
+                    for i in range(tests)
+                ],
+            },
+        }
+    }).encode("utf-8")
+
+
+def run_method(method, payload, repeats, queue):
+    chunks = [payload[i:i + CHUNK_SIZE] for i in range(0, len(payload), CHUNK_SIZE)]
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        if method == "full":
+            instance = project_instance(json.loads(b"".join(chunks)).get("data", {}))
+        else:
+            instance = parse_instance_stream(iter(chunks))
+        timings.append(time.perf_counter() - started)
+        assert instance["results"]["tests"]
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "method": method,
+        "median_seconds": sorted(timings)[len(timings) // 2],
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "rss_growth_mb": round((peak_rss - baseline_rss) / 1024, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tests", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--stack-lines", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    payload = build_payload(args.tests, args.attempts, args.stack_lines)
+    print(f"Payload: {len(payload) / 1024 / 1024:.1f} MB, {args.tests} tests x {args.attempts} attempts")
+
+    methods = ["full"] + (["stream"] if ijson is not None else [])
+    if ijson is None:
+        print("ijson is not installed; only the full-parse path can be measured.")
+
+    # Each method runs in a fresh process so peak RSS isn't shared between them
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for method in methods:
+        queue = context.Queue()
+        process = context.Process(target=run_method, args=(method, payload, args.repeats, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    for result in results:
+        print(f"{result['method']:>8}: {result['median_seconds'] * 1000:8.1f} ms   peak RSS {result['peak_rss_mb']:7.1f} MB   (+{result['rss_growth_mb']} MB)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"payload_bytes": len(payload), "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
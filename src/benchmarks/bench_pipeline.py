@@ -0,0 +1,255 @@
+"""
+Benchmark the pipeline against the synthetic Currents server, offline.
+
+    python src/benchmarks/bench_pipeline.py --instances 100 --tests 20 --repeats 5 --json baseline.json
+    python src/benchmarks/bench_pipeline.py --latency 0.05 --tail-ratio 0.01 --compare baseline.json
+
+The stub server runs in its own process. Every benchmark repeat runs in a
+fresh process with an empty cache directory, so each measures a cold start,
+and peak RSS belongs to that benchmark alone. Pass `--warm-cache` to keep the
+response cache between repeats instead.
+
+Benchmarks:
+    get_test_results_for_run  download and parse the newest run
+    compare_test_results      diff the two newest runs (downloads untimed)
+    enrich_test_data          history for the Still Failing tests (downloads untimed)
+    main                      the whole `main()` pipeline with `--no-llm`
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from queue import Empty
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC_DIR)
+
+from benchmarks.currents_stub_server import add_config_arguments, config_from_args, serve  # noqa: E402
+
+BENCHMARKS = ("get_test_results_for_run", "compare_test_results", "enrich_test_data", "main")
+
+
+def free_port():
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_server(port, config):
+    serve(port, config).serve_forever()
+
+
+def wait_for_server(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"Stub server did not start on port {port}")
+
+
+def quantile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_benchmark(name, env, workdir, queue):
+    """
+    Runs in a fresh process: set up the environment, time one benchmark, report back.
+    A failure (including `SystemExit`) is reported as `{"error", "traceback"}`,
+    since the child's own output goes to /dev/null.
+    """
+    os.environ.update(env)
+    os.chdir(workdir)
+    sys.path.insert(0, SRC_DIR)
+    sys.argv = ["main.py", "--no-llm"]
+    # Keep progress bars and prints out of the benchmark output
+    devnull = open(os.devnull, "w")
+    sys.stdout = sys.stderr = devnull
+
+    try:
+        queue.put(measure(name, env))
+    except BaseException as e:
+        queue.put({"error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+
+
+def measure(name, env):
+    from currents.get_run_details import get_run_details
+    from currents.get_test_results_for_run import get_test_results_for_run
+    from helpers.data.compare_test_results import compare_test_results
+    from helpers.data.enrich_test_data import enrich_test_data
+    from helpers.tools.metrics import metrics
+
+    current_run_id, previous_run_id = env["CURRENTS_RUN_ID"], env["BENCH_PREVIOUS_RUN_ID"]
+
+    if name == "get_test_results_for_run":
+        started = time.perf_counter()
+        units = len(get_test_results_for_run(current_run_id, compact=True))
+        elapsed = time.perf_counter() - started
+        unit = "tests"
+    elif name in ("compare_test_results", "enrich_test_data"):
+        current_tests = get_test_results_for_run(current_run_id, compact=True)
+        previous_tests = get_test_results_for_run(previous_run_id, compact=True)
+        started = time.perf_counter()
+        test_run_diff = compare_test_results(previous_tests, current_tests)
+        elapsed = time.perf_counter() - started
+        units, unit = len(current_tests), "tests"
+        if name == "enrich_test_data":
+            current_run_details = get_run_details(current_run_id)
+            started = time.perf_counter()
+            enrich_test_data(test_run_diff, current_run_details)
+            elapsed = time.perf_counter() - started
+            units, unit = len(test_run_diff["Still Failing"]), "tests enriched"
+    else:
+        import main
+        started = time.perf_counter()
+        main.main()
+        elapsed = time.perf_counter() - started
+        units, unit = metrics.to_dict()["totals"]["requests"], "requests"
+
+    totals = metrics.to_dict()
+    # Histogram bucket bounds, taken from the slowest endpoint
+    request_latency = {
+        q: max((metrics.latency_quantile(endpoint, q) or 0 for endpoint in totals["endpoints"]), default=None)
+        for q in (0.5, 0.99)
+    }
+    return {
+        "seconds": elapsed,
+        "units": units,
+        "unit": unit,
+        "requests": totals["totals"]["requests"],
+        "retries": totals["totals"]["retries"],
+        "rate_limited": totals["totals"]["rateLimited"],
+        "request_p50_seconds": request_latency[0.5],
+        "request_p99_seconds": request_latency[0.99],
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def wait_for_result(process, queue):
+    """The child's result, or an error record if it died without reporting one."""
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                return {"error": f"benchmark process exited with code {process.exitcode} without a result"}
+
+
+def summarize(samples):
+    seconds = [sample["seconds"] for sample in samples]
+    p50 = quantile(seconds, 0.5)
+    return {
+        "repeats": len(samples),
+        "p50_seconds": round(p50, 4),
+        "p99_seconds": round(quantile(seconds, 0.99), 4),
+        "throughput_per_second": round(samples[0]["units"] / p50, 1) if p50 else None,
+        "unit": samples[0]["unit"],
+        "units": samples[0]["units"],
+        "requests": samples[0]["requests"],
+        "request_p50_seconds": max(sample["request_p50_seconds"] or 0 for sample in samples),
+        "request_p99_seconds": max(sample["request_p99_seconds"] or 0 for sample in samples),
+        "retries": max(sample["retries"] for sample in samples),
+        "rate_limited": max(sample["rate_limited"] for sample in samples),
+        "peak_rss_mb": max(sample["peak_rss_mb"] for sample in samples),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Print the change against a saved baseline; returns False if any p50 regressed past `tolerance`."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\nAgainst {baseline_path}:")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result["p50_seconds"] - before["p50_seconds"]) / before["p50_seconds"] if before["p50_seconds"] else 0
+        rss_change = result["peak_rss_mb"] - before["peak_rss_mb"]
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"  {name:>26}: p50 {change:+.0%}, peak RSS {rss_change:+.1f} MB{'  ← regression' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_config_arguments(parser)
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help="Comma-separated subset to run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the response cache between repeats")
+    parser.add_argument("--json", help="Write results to this file (e.g. as a baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown before --compare fails")
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    context = multiprocessing.get_context("spawn")
+    port = free_port()
+    server = context.Process(target=run_server, args=(port, config), daemon=True)
+    server.start()
+    wait_for_server(port)
+
+    env = {
+        "CURRENTS_API_URL": f"http://127.0.0.1:{port}/v1",
+        "CURRENTS_API_KEY": "bench",
+        "CURRENTS_PROJECT_ID": "bench",
+        "CURRENTS_RUN_ID": f"run{config.runs - 1:04d}",
+        "BENCH_PREVIOUS_RUN_ID": f"run{config.runs - 2:04d}",
+        "CURRENTS_RATE_LIMIT": str(config.rate_limit),
+        "CURRENTS_RATE_BURST": str(config.rate_limit),
+        "CURRENTS_CACHE": "on" if args.warm_cache else "off",
+        "OPENAI_API_KEY": "",
+    }
+    print(f"Stub: {config.runs} runs × {config.instances} instances × {config.tests} tests, latency {config.latency}s")
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as shared_dir:
+            for name in args.benchmarks.split(","):
+                samples = []
+                for _ in range(args.repeats):
+                    workdir = shared_dir if args.warm_cache else tempfile.mkdtemp(dir=shared_dir)
+                    queue = context.Queue()
+                    process = context.Process(target=run_benchmark, args=(name, dict(env, CURRENTS_CACHE_DIR=os.path.join(workdir, ".cache")), workdir, queue))
+                    process.start()
+                    sample = wait_for_result(process, queue)
+                    process.join()
+                    if "error" in sample:
+                        print(f"{name:>26}: failed: {sample['error']}\n{sample.get('traceback', '')}", file=sys.stderr)
+                        sys.exit(1)
+                    samples.append(sample)
+                results[name] = summarize(samples)
+                result = results[name]
+                print(f"{name:>26}: p50 {result['p50_seconds'] * 1000:8.1f} ms   p99 {result['p99_seconds'] * 1000:8.1f} ms   "
+                      f"{result['throughput_per_second']} {result['unit']}/s   {result['requests']} requests (p99 ≤ {result['request_p99_seconds']}s)   peak RSS {result['peak_rss_mb']} MB")
+    finally:
+        server.terminate()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "config": vars(config),
+                "repeats": args.repeats,
+                "warm_cache": args.warm_cache,
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
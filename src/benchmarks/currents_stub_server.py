@@ -0,0 +1,298 @@
+"""
+Synthetic stand-in for the Currents API, for benchmarking without touching the
+real API or its rate limit. Data is generated deterministically at the
+requested scale, and latency, slow tail responses, 429s and `/instances`
+outages (503s) can be injected.
+
+    python src/benchmarks/currents_stub_server.py --port 8790 --runs 10 --instances 50 --tests 20
+    CURRENTS_API_URL=http://127.0.0.1:8790/v1 CURRENTS_PROJECT_ID=bench CURRENTS_RUN_ID=run0009 npm run analyze
+
+Runs are `run0000` (oldest) to `run{N-1}` (newest), six hours apart, on `main`
+with the `merge` tag. Some tests start failing halfway through the runs and
+keep failing, so the newest runs have Still Failing tests with history behind them.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BASE_TIME = datetime(2025, 4, 1)
+RUN_SPACING = timedelta(hours=6)
+GROUPS = ("e2e-electron", "e2e-browser")
+ERRORS = (
+    "Timeout {n}ms exceeded waiting for locator('#cell-{m}') to be visible",
+    "expect(received).toBe(expected) at /repo/test/e2e/tests/feature_{m}.test.ts:{n}:17",
+    "Target page, context or browser has been closed",
+    "net::ERR_CONNECTION_REFUSED at http://localhost:{n}/api/{m}",
+)
+HISTORY_PAGE_SIZE = 50
+
+
+@dataclass
+class StubConfig:
+    runs: int = 10
+    instances: int = 50
+    tests: int = 20
+    attempts: int = 2
+    history_depth: int = 20
+    failure_rate: float = 0.02
+    persistent_failure_rate: float = 0.01
+    latency: float = 0.0
+    tail_ratio: float = 0.0
+    tail_latency: float = 1.0
+    rate_limit_ratio: float = 0.0
+    rate_limit: int = 1000
+    instance_error_ratio: float = 0.0
+
+
+class SyntheticProject:
+    """Deterministic runs, instances and history derived from a `StubConfig`."""
+
+    def __init__(self, config):
+        self.config = config
+        self.signatures = {}
+
+    def run_id(self, n):
+        return f"run{n:04d}"
+
+    def created_at(self, n):
+        return (BASE_TIME + n * RUN_SPACING).isoformat() + "Z"
+
+    def commit(self, n):
+        return {"branch": "main", "sha": hashlib.sha1(f"commit-{n}".encode()).hexdigest(), "authorName": "Bench Author"}
+
+    def test_count(self, n, i):
+        # The newest run adds one test, so there is always a New Test
+        return self.config.tests + (1 if n == self.config.runs - 1 and i == 0 else 0)
+
+    def test_state(self, n, i, t):
+        # The first test always fails persistently, so there is a Still Failing test at any scale
+        persistent = (i, t) == (0, 0) or random.Random(f"persistent-{i}-{t}").random() < self.config.persistent_failure_rate
+        if persistent and n >= self.config.runs // 2:
+            return "failed"
+        return "failed" if random.Random(f"{n}-{i}-{t}").random() < self.config.failure_rate else "passed"
+
+    def spec(self, i):
+        return f"tests/feature_{i:03d}.test.ts"
+
+    def title(self, i, t):
+        return [f"Feature {i}", f"Scenario {t} does the thing"]
+
+    def run_summary(self, n):
+        return {
+            "runId": self.run_id(n),
+            "cursor": self.run_id(n),
+            "createdAt": self.created_at(n),
+            "completionState": "COMPLETE",
+            "tags": ["merge"],
+            "meta": {"commit": self.commit(n)},
+        }
+
+    def run(self, n):
+        specs = []
+        for i in range(self.config.instances):
+            states = [self.test_state(n, i, t) for t in range(self.test_count(n, i))]
+            failures = states.count("failed")
+            specs.append({
+                "instanceId": f"{self.run_id(n)}-i{i:04d}",
+                "spec": self.spec(i),
+                "groupId": GROUPS[i % len(GROUPS)],
+                "results": {"stats": {"tests": len(states), "passes": len(states) - failures, "failures": failures}},
+            })
+        return dict(self.run_summary(n), specs=specs)
+
+    def instance(self, n, i):
+        tests = []
+        for t in range(self.test_count(n, i)):
+            state = self.test_state(n, i, t)
+            attempts = []
+            for a in range(self.config.attempts if state == "failed" else 1):
+                error = None
+                if state == "failed":
+                    message = ERRORS[(i + t) % len(ERRORS)].format(n=1000 * (a + 1) + t, m=i)
+                    error = {"message": message, "stack": f"Error: {message}\n" + "    at step (/repo/test/e2e/tests/x.ts:1:1)\n" * 10}
+                attempts.append({"state": state, "error": error})
+            tests.append({"title": self.title(i, t), "testId": f"t{i:04d}-{t:04d}", "state": state, "attempts": attempts})
+        return {
+            "groupId": GROUPS[i % len(GROUPS)],
+            "spec": self.spec(i),
+            "signature": f"instance-{i}",
+            "completedAt": self.created_at(n),
+            "results": {"stats": {"tests": len(tests), "wallClockEndedAt": self.created_at(n)}, "tests": tests},
+        }
+
+    def signature(self, spec, title):
+        signature = hashlib.sha1(f"{spec}|{title}".encode()).hexdigest()[:16]
+        match = re.match(r"tests/feature_(\d+)\.test\.ts", spec)
+        test = re.search(r"Scenario (\d+)", title)
+        if match and test:
+            self.signatures[signature] = (int(match.group(1)), int(test.group(1)))
+        return signature
+
+    def history(self, signature, date_start, date_end, starting_after=None):
+        """Results of one test, newest first, over the project's runs and `history_depth` older ones."""
+        if signature not in self.signatures:
+            return [], None
+        i, t = self.signatures[signature]
+        records = []
+        for n in range(self.config.runs - 1, -self.config.history_depth - 1, -1):
+            created_at = self.created_at(n)
+            if not (date_start <= created_at < date_end) or t >= self.test_count(n, i):
+                continue
+            records.append({
+                "status": self.test_state(n, i, t),
+                "groupId": GROUPS[i % len(GROUPS)],
+                "commit": self.commit(n),
+                "tags": ["merge"],
+                "createdAt": created_at,
+            })
+        start = int(starting_after or 0)
+        page = records[start:start + HISTORY_PAGE_SIZE]
+        next_cursor = str(start + HISTORY_PAGE_SIZE) if start + HISTORY_PAGE_SIZE < len(records) else None
+        return page, next_cursor
+
+    def parse_run(self, run_id):
+        match = re.fullmatch(r"run(\d+)", run_id)
+        n = int(match.group(1)) if match else -1
+        return n if 0 <= n < self.config.runs else None
+
+
+class CurrentsStubHandler(BaseHTTPRequestHandler):
+    project = None
+    requests_served = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        if self.delay_or_throttle():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+
+        if re.fullmatch(r"/v1/projects/[^/]+/runs", path):
+            self.list_runs(query)
+        elif match := re.fullmatch(r"/v1/runs/([^/]+)", path):
+            n = self.project.parse_run(match.group(1))
+            self.reply(200, {"data": self.project.run(n)} if n is not None else {"error": "Run not found"}, status_if_error=404)
+        elif match := re.fullmatch(r"/v1/instances/(run\d+)-i(\d+)", path):
+            n = self.project.parse_run(match.group(1))
+            i = int(match.group(2))
+            if n is None or i >= self.project.config.instances:
+                self.reply(404, {"error": "Instance not found"})
+            elif random.random() < self.project.config.instance_error_ratio:
+                self.reply(503, {"error": "Service Unavailable"})
+            else:
+                self.reply(200, {"data": self.project.instance(n, i)})
+        elif match := re.fullmatch(r"/v1/test-results/([^/]+)", path):
+            data, next_cursor = self.project.history(
+                match.group(1),
+                query.get("date_start", [""])[0],
+                query.get("date_end", ["~"])[0],
+                query.get("starting_after", [None])[0],
+            )
+            self.reply(200, {"data": data, "meta": {"next_cursor": next_cursor}})
+        else:
+            self.reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.delay_or_throttle():
+            return
+        if urlparse(self.path).path == "/v1/signature/test":
+            signature = self.project.signature(body.get("specFilePath", ""), body.get("testTitle", ""))
+            self.reply(200, {"data": {"signature": signature}})
+        else:
+            self.reply(404, {"error": "Not found"})
+
+    def list_runs(self, query):
+        limit = int(query.get("limit", ["10"])[0])
+        newest = self.project.config.runs - 1
+        if "ending_after" in query:
+            newest = (self.project.parse_run(query["ending_after"][0]) or 0) - 1
+        runs = [self.project.run_summary(n) for n in range(newest, max(newest - limit, -1), -1)]
+        self.reply(200, {"data": runs, "has_more": newest - limit >= 0})
+
+    def delay_or_throttle(self):
+        """Apply the configured latency; returns True if this request was answered with a 429."""
+        config = self.project.config
+        with CurrentsStubHandler._lock:
+            CurrentsStubHandler.requests_served += 1
+        rng = random.random()
+        time.sleep(config.tail_latency if rng < config.tail_ratio else config.latency)
+        if random.random() < config.rate_limit_ratio:
+            self.reply(429, {"error": "Too Many Requests"}, remaining=0)
+            return True
+        return False
+
+    def reply(self, code, body, status_if_error=None, remaining=None):
+        if status_if_error and "error" in body:
+            code = status_if_error
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        limit = self.project.config.rate_limit
+        self.send_header("X-RateLimit-Limit", str(limit))
+        self.send_header("X-RateLimit-Remaining", str(limit if remaining is None else remaining))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 1))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8790, config=None):
+    CurrentsStubHandler.project = SyntheticProject(config or StubConfig())
+    server = ThreadingHTTPServer(("127.0.0.1", port), CurrentsStubHandler)
+    server.daemon_threads = True
+    return server
+
+
+def add_config_arguments(parser):
+    defaults = StubConfig()
+    parser.add_argument("--runs", type=int, default=defaults.runs)
+    parser.add_argument("--instances", type=int, default=defaults.instances, help="Spec instances per run")
+    parser.add_argument("--tests", type=int, default=defaults.tests, help="Tests per instance")
+    parser.add_argument("--attempts", type=int, default=defaults.attempts, help="Attempts per failed test")
+    parser.add_argument("--history-depth", type=int, default=defaults.history_depth, help="Extra runs of history before the first run")
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Seconds added to every response")
+    parser.add_argument("--tail-ratio", type=float, default=defaults.tail_ratio, help="Share of responses that are slow")
+    parser.add_argument("--tail-latency", type=float, default=defaults.tail_latency, help="Seconds a slow response takes")
+    parser.add_argument("--rate-limit-ratio", type=float, default=defaults.rate_limit_ratio, help="Share of requests answered with 429")
+    parser.add_argument("--instance-error-ratio", type=float, default=defaults.instance_error_ratio, help="Share of /instances requests answered with 503")
+    parser.add_argument("--rate-limit", type=int, default=defaults.rate_limit, help="Requests per second advertised in the rate-limit headers")
+
+
+def config_from_args(args):
+    return StubConfig(
+        runs=args.runs,
+        instances=args.instances,
+        tests=args.tests,
+        attempts=args.attempts,
+        history_depth=args.history_depth,
+        failure_rate=args.failure_rate,
+        latency=args.latency,
+        tail_ratio=args.tail_ratio,
+        tail_latency=args.tail_latency,
+        rate_limit_ratio=args.rate_limit_ratio,
+        rate_limit=args.rate_limit,
+        instance_error_ratio=args.instance_error_ratio,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8790)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    print(f"Currents stub listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, config_from_args(args)).serve_forever()
@@ -0,0 +1,99 @@
+"""
+Minimal OpenAI-compatible `/v1/chat/completions` server for running the LLM
+steps offline. Replies are deterministic: the test lines found in the prompt
+are echoed back, and Patterns requests get a fixed observation. Requests with
+`"stream": true` get the reply as server-sent events.
+
+    python src/benchmarks/openai_stub_server.py --port 8765 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub npm run analyze
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def reply_for(prompt):
+    if "Output only this section" in prompt and "Patterns" in prompt:
+        return "🔍 Patterns\n• Stub: several new failures share the same error"
+    lines = [line.strip() for line in prompt.splitlines() if line.strip().startswith("[") and "]" in line]
+    # Drop the example lines from the instructions; keep the ones from the diff
+    lines = [line for line in lines if "Feature > Test name" not in line and "Login > Should be able" not in line]
+    return "\n".join(lines) or "No changes."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+        time.sleep(self.latency)
+        StubHandler.requests_served += 1
+
+        content = reply_for(prompt)
+        if body.get("stream"):
+            self.stream_reply(body, content)
+            return
+
+        completion = {
+            "id": f"stub-{StubHandler.requests_served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+        payload = json.dumps(completion).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def stream_reply(self, body, content):
+        """Send the reply as server-sent `chat.completion.chunk` events, one word per event."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        words = content.split(" ")
+        for index, word in enumerate(words):
+            chunk = {
+                "id": f"stub-{StubHandler.requests_served}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": word if index == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        done = {
+            "id": f"stub-{StubHandler.requests_served}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8765, latency=0.0):
+    StubHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    args = parser.parse_args()
+    print(f"OpenAI stub listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.latency).serve_forever()
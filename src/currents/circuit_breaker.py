@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+import requests
+from helpers.tools.metrics import endpoint_name, metrics
+
+# Consecutive failures (connection errors, timeouts, 5xx) that open an endpoint's breaker
+FAILURE_THRESHOLD = int(os.getenv("CURRENTS_BREAKER_FAILURES", "10"))
+# Seconds an open breaker fails fast before letting one probe request through
+COOLDOWN_SECONDS = float(os.getenv("CURRENTS_BREAKER_COOLDOWN", "30"))
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while the endpoint's breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker: after `failure_threshold` consecutive failures the
+    endpoint is considered down, and requests fail at once instead of backing off
+    and retrying. After `cooldown` seconds one probe request is let through
+    (half-open); its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+        Raise `CircuitOpenError` unless a request may be sent now. Returns True when
+        this request is the half-open probe; the caller must then `end_probe()` once
+        the request is over, however it ends.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self._set_state("half-open")
+            if self.state == "closed" or (self.state == "half-open" and not self._probing):
+                self._probing = self.state == "half-open"
+                return self._probing
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit open for {self.name}, failing fast")
+
+    def end_probe(self):
+        """
+        Let another probe through if this one ended without a recorded outcome (e.g. an
+        unexpected exception), instead of rejecting every request for the rest of the run.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half-open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                self._set_state("open")
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == "open"
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "trips": self.trips, "rejected": self.rejected, "failures": self.failures}
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.record_breaker_state(self.name, state)
+        print(f"⚡ Circuit breaker for {self.name}: {state}")
+
+
+def get_breaker(url):
+    """The breaker of the endpoint `url` belongs to (ids collapsed, as in the metrics)."""
+    name = endpoint_name(url)
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_stats():
+    """`endpoint -> stats` for every breaker that has seen a request."""
+    with _lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
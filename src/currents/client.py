@@ -0,0 +1,99 @@
+import contextlib
+import contextvars
+import os
+import threading
+from dataclasses import dataclass, replace
+
+# Base URL of the Currents API; point CURRENTS_API_URL at a local stand-in (see src/benchmarks) to run offline
+DEFAULT_API_URL = "https://api.currents.dev/v1"
+
+
+def env_list(name):
+    return tuple(os.getenv(name).split(",")) if os.getenv(name) else ()
+
+
+@dataclass(frozen=True)
+class CurrentsClient:
+    """
+    Everything that identifies who is asking the Currents API, and for what.
+
+    The `currents` functions read the active client through `get_client()`, so
+    several clients (projects, branches) can be served from one process.
+    `branches`/`tags` pick which runs count as "previous" runs;
+    `history_branches`/`history_tags` filter test history records.
+    """
+
+    api_key: str
+    project_id: str
+    api_url: str = DEFAULT_API_URL
+    branches: tuple = ("main", "refs/heads/main")
+    tags: tuple = ("merge",)
+    history_branches: tuple = ()
+    history_tags: tuple = ()
+    name: str = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        The client configured by `CURRENTS_API_KEY`, `CURRENTS_PROJECT_ID`, `CURRENTS_API_URL`,
+        `FILTER_BRANCHES` and `FILTER_TAGS`, read when called (so after `load_dotenv()`).
+        """
+        return cls(
+            api_url=os.getenv("CURRENTS_API_URL", DEFAULT_API_URL).rstrip("/"),
+            api_key=os.getenv("CURRENTS_API_KEY"),
+            project_id=os.getenv("CURRENTS_PROJECT_ID"),
+            history_branches=env_list("FILTER_BRANCHES"),
+            history_tags=env_list("FILTER_TAGS"),
+        )
+
+    def for_target(self, project_id=None, branch=None, tags=None, run_id=None, name=None):
+        """
+        A copy for another project and/or branch, with the history filtered to that
+        branch too. The name (`project:branch[@runId]` unless given) is also the key
+        the HTTP pool shares its workers by, so each target should get its own.
+        """
+        client = replace(self, project_id=project_id or self.project_id)
+        if branch:
+            branches = (branch,) if branch.startswith("refs/") else (branch, f"refs/heads/{branch}")
+            client = replace(client, branches=branches, history_branches=branches)
+        if tags is not None:
+            client = replace(client, tags=tuple(tags))
+        return replace(client, name=name or f"{client.project_id}:{client.branches[0]}" + (f"@{run_id}" if run_id else ""))
+
+    @property
+    def label(self):
+        return self.name or self.project_id or "default"
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+
+_default_client = None
+_default_lock = threading.Lock()
+_current_client = contextvars.ContextVar("currents_client", default=None)
+
+
+def get_client():
+    """
+    The client for the current context: the one set by `use_client`, otherwise
+    the process default, built from the environment on first use.
+    """
+    client = _current_client.get()
+    if client is not None:
+        return client
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = CurrentsClient.from_env()
+        return _default_client
+
+
+@contextlib.contextmanager
+def use_client(client):
+    """Make `client` the active client for this thread/task and the pool work it submits."""
+    token = _current_client.set(client)
+    try:
+        yield client
+    finally:
+        _current_client.reset(token)
@@ -1,69 +1,83 @@
 import requests
 from currents.retry_request import retry_request
-import concurrent.futures
-import os
-import sys
+from currents.client import get_client
+from currents.http_engine import get_session
+from currents.hedged_request import instance_hedger
+from currents.response_cache import get_response_cache, store_response
+from currents.parse_instance_payload import parse_instance_payload
+from helpers.tools.metrics import metrics
 
-MAX_WORKERS = 5
-LAST_RUN_LIMIT = 10
-CURRENTS_API_KEY = os.getenv("CURRENTS_API_KEY")
-CURRENTS_PROJECT_ID = os.getenv("CURRENTS_PROJECT_ID")
-HEADERS = {"Authorization": f"Bearer {CURRENTS_API_KEY}"}
+CHUNK_SIZE = 64 * 1024
+STREAM_RETRIES = 2
 
-def fetch_instance_tests(instance_id):
-    instance_url = f"https://api.currents.dev/v1/instances/{instance_id}"
-    try:
-        response = retry_request(requests.get, instance_url, headers=HEADERS, timeout=30)
-        instance_data = response.json().get("data", {})
-        
-        group_id = instance_data.get("groupId")
-        spec_path = instance_data.get("spec")
-        
-        # Check if tests exist
-        tests = instance_data.get("results", {}).get("tests", [])
-        if not tests:
-            print(f"No tests found for instance {instance_id}")  # Debug print
-            return []
+def fetch_instance_data(instance_url):
+    """
+    Download an instance and parse only the fields we use while the body streams in.
+    When the response cache is on, the raw bytes are kept aside and cached afterwards.
+    """
+    for attempt in range(STREAM_RETRIES):
+        response = retry_request(get_session().get, instance_url, headers=get_client().headers, timeout=30, stream=True)
+        keep_body = get_response_cache() is not None and not getattr(response, "from_cache", False)
+        body = bytearray()
+        received = [0]
 
-        # Process tests concurrently if there are many
-        results = []
-        if len(tests) > 10:  # Only use concurrency if there are enough tests to justify it
-            with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(tests))) as executor:
-                def process_test(test):
-                    test_name = " > ".join(test["title"]) if isinstance(test["title"], list) else str(test["title"])
+        def chunks():
+            for chunk in response.iter_content(CHUNK_SIZE):
+                received[0] += len(chunk)
+                if keep_body:
+                    body.extend(chunk)
+                yield chunk
 
-                    return {
-                        "name": test_name,
-                        "title": test.get("title"),
-                        "testId": test.get("testId"),
-                        "state": test.get("state"),
-                        "groupId": group_id,
-                        "spec": spec_path,
-                        "signature": instance_data.get("signature"),
-                        "attempts": test.get("attempts")
-                    }
-                
-                # Map tests to futures and collect results
-                futures = {executor.submit(process_test, test): test for test in tests}
-                for future in concurrent.futures.as_completed(futures):
-                    results.append(future.result())
-        else:
-            # Process sequentially for small number of tests
-            for test in tests:
-                test_name = " > ".join(test["title"]) if isinstance(test["title"], list) else str(test["title"])
+        try:
+            instance_data = parse_instance_payload(chunks())
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError) as e:
+            # retry_request only covers the headers; a body cut off mid-stream is retried here
+            if attempt == STREAM_RETRIES - 1:
+                raise
+            print(f"Instance body interrupted, retrying... Error: {e}")
+            metrics.record_retry(instance_url)
+            continue
+        finally:
+            if not getattr(response, "from_cache", False):
+                metrics.record_bytes(instance_url, received[0])
 
-                results.append({
-                    "name": test_name,
-                    "title": test["title"],
-                    "testId": test.get("testId"),
-                    "state": test.get("state"),
-                    "groupId": group_id,
-                    "spec": spec_path,
-                    "signature": instance_data.get("signature"),
-                    "attempts": test.get("attempts"),
-                })
-                
-        return results
-    except requests.RequestException as e:
-        print(f"Error fetching data for instance {instance_id}: {e}", file=sys.stderr)
+        if keep_body:
+            store_response("GET", instance_url, {}, response, body=bytes(body), data=instance_data)
+        return instance_data
+
+def instance_tests(instance_id, instance_data):
+    """Flatten a parsed instance into one result dict per test."""
+    group_id = instance_data.get("groupId")
+    spec_path = instance_data.get("spec")
+
+    # Check if tests exist
+    tests = instance_data.get("results", {}).get("tests", [])
+    if not tests:
+        print(f"No tests found for instance {instance_id}")  # Debug print
         return []
+
+    results = []
+    for test in tests:
+        test_name = " > ".join(test["title"]) if isinstance(test["title"], list) else str(test["title"])
+
+        results.append({
+            "name": test_name,
+            "title": test["title"],
+            "testId": test.get("testId"),
+            "state": test.get("state"),
+            "groupId": group_id,
+            "spec": spec_path,
+            "signature": instance_data.get("signature"),
+            "attempts": test.get("attempts"),
+        })
+
+    return results
+
+async def fetch_instance_tests_async(instance_id):
+    """
+    Download one instance's tests. A download running past the recent p95 is
+    hedged with a second request, and errors (HTTP or parse) are raised so the
+    caller can tell a failed instance from an empty one.
+    """
+    instance_data = await instance_hedger.call(fetch_instance_data, f"{get_client().api_url}/instances/{instance_id}")
+    return instance_tests(instance_id, instance_data)
@@ -1,8 +1,7 @@
 import requests
-import os
-
-CURRENTS_PROJECT_ID = os.getenv("CURRENTS_PROJECT_ID")
-CURRENTS_API_KEY = os.getenv("CURRENTS_API_KEY")
+from currents.client import get_client
+from currents.http_engine import get_session
+from currents.retry_request import retry_request
 
 def get_project_runs(limit: int = 10, ending_after: str = None, tags: list = None, branches: list = None) -> dict:
     """
@@ -18,9 +17,10 @@ def get_project_runs(limit: int = 10, ending_after: str = None, tags: list = Non
     Returns:
         dict: Response containing the list of filtered runs or an error message.
     """
-    url = f"https://api.currents.dev/v1/projects/{CURRENTS_PROJECT_ID}/runs"
+    client = get_client()
+    url = f"{client.api_url}/projects/{client.project_id}/runs"
     headers = {
-        "Authorization": f"Bearer {CURRENTS_API_KEY}",
+        **client.headers,
         "Content-Type": "application/json"
     }
     params = {
@@ -36,8 +36,7 @@ def get_project_runs(limit: int = 10, ending_after: str = None, tags: list = Non
             params.setdefault("branches[]", []).append(branch)
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
+        response = retry_request(get_session().get, url, headers=headers, params=params, timeout=10)
         data = response.json()
 
         if "data" in data and (tags or branches):
@@ -57,42 +56,95 @@ def get_project_runs(limit: int = 10, ending_after: str = None, tags: list = Non
 
         return data
     except requests.HTTPError as http_err:
-        return {"error": str(http_err), "status_code": response.status_code}
+        return {"error": str(http_err), "status_code": http_err.response.status_code}
     except Exception as err:
         return {"error": str(err)}
 
 
-def get_previous_run(reference_run_id: str, tags: list = ['merge'], branches: list = ['main', 'refs/heads/main']) -> dict:
+def run_filters(tags, branches):
+    """The given run filters, with the active client's branches/tags for any left as None."""
+    client = get_client()
+    return {
+        "tags": list(client.tags) if tags is None else tags,
+        "branches": list(client.branches) if branches is None else branches,
+    }
+
+
+def get_previous_run(reference_run_id: str, tags: list = None, branches: list = None) -> dict:
     """
     Fetch the immediate previous run for a given Currents project before a specific run ID.
 
+    The lookup is served from the local run index, which only fetches runs newer than
+    the ones it already knows about (and older pages only when needed).
+
     Args:
         reference_run_id (str): The run ID to look back from.
+        tags (list, optional): Tags the previous run must carry (default: the client's).
+        branches (list, optional): Branches the previous run may come from (default: the client's).
 
     Returns:
         dict: The previous run details or an error message.
     """
+    from currents.run_index import get_run_index
+
+    previous_run = get_run_index().previous_run(reference_run_id, **run_filters(tags, branches))
+    if previous_run:
+        return previous_run
+
+    return {"error": f"Previous run not found for {reference_run_id}"}
+
+
+def get_latest_run(tags: list = None, branches: list = None) -> dict:
+    """
+    Fetch the newest run matching the filters from the local run index.
 
-    cursor = None
-    seen_reference = False
+    Args:
+        tags (list, optional): Tags the run must carry (default: the client's).
+        branches (list, optional): Branches the run may come from (default: the client's).
 
-    while True:
-        recent_runs = get_project_runs(limit=50, ending_after=cursor, tags = tags, branches = branches)
-        runs = recent_runs.get("data", [])
-        if not runs:
-            break
+    Returns:
+        dict: The run details or an error message.
+    """
+    from currents.run_index import get_run_index
 
-        for run in runs:
-            if seen_reference and run.get("runId") != reference_run_id:
-                return run
-            if run.get("runId") == reference_run_id:
-                seen_reference = True
+    latest_run = get_run_index().latest_run(**run_filters(tags, branches))
+    if latest_run:
+        return latest_run
 
-        if not recent_runs.get("has_more"):
-            break
+    return {"error": f"No run found for {get_client().label}"}
 
-        cursor = runs[-1].get("cursor")
-        if not cursor:
-            break
 
-    return {"error": f"Previous run not found for {reference_run_id}"}
+def get_previous_runs(reference_run_id: str, count: int, tags: list = None, branches: list = None) -> list:
+    """
+    Fetch up to `count` runs before a given run ID, newest first, from the local run index.
+
+    Args:
+        reference_run_id (str): The run ID to look back from.
+        count (int): How many runs to return at most.
+        tags (list, optional): Tags the runs must carry (default: the client's).
+        branches (list, optional): Branches the runs may come from (default: the client's).
+
+    Returns:
+        list: The runs' details; shorter than `count` when history runs out.
+    """
+    from currents.run_index import get_run_index
+
+    return get_run_index().previous_runs(reference_run_id, count, **run_filters(tags, branches))
+
+
+def get_runs_between(since: str, until: str, tags: list = None, branches: list = None) -> list:
+    """
+    Fetch the runs created between two ISO timestamps, oldest first, from the local run index.
+
+    Args:
+        since (str): Earliest `createdAt` to include.
+        until (str): Latest `createdAt` to include.
+        tags (list, optional): Tags the runs must carry (default: the client's).
+        branches (list, optional): Branches the runs may come from (default: the client's).
+
+    Returns:
+        list: The runs' details.
+    """
+    from currents.run_index import get_run_index
+
+    return get_run_index().runs_between(since, until, **run_filters(tags, branches))
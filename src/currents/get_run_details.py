@@ -1,7 +1,7 @@
 import requests
-import os
-
-CURRENTS_API_KEY = os.getenv("CURRENTS_API_KEY")
+from currents.client import get_client
+from currents.http_engine import get_session
+from currents.retry_request import retry_request
 
 def get_run_details(run_id: str) -> dict:
     """
@@ -14,19 +14,19 @@ def get_run_details(run_id: str) -> dict:
     Returns:
         dict: The run details, or an error message if unsuccessful.
     """
-    url = f"https://api.currents.dev/v1/runs/{run_id}"
+    client = get_client()
+    url = f"{client.api_url}/runs/{run_id}"
     headers = {
-        "Authorization": f"Bearer {CURRENTS_API_KEY}",
+        **client.headers,
         "Content-Type": "application/json"
     }
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        response = retry_request(get_session().get, url, headers=headers, timeout=10)
         raw_data = response.json()
     except requests.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
-        return {"error": str(http_err), "status_code": response.status_code}
+        return {"error": str(http_err), "status_code": http_err.response.status_code}
     except Exception as err:
         print(f"Unexpected error: {err}")
         return {"error": str(err)}
@@ -1,125 +1,201 @@
 import os
-import requests
+import threading
+from datetime import datetime, timedelta
 from currents.retry_request import retry_request
+from currents.client import get_client
+from currents.http_engine import get_session
 
-MAX_WORKERS = 5
-LAST_RUN_LIMIT = 10
-CURRENTS_API_KEY = os.getenv("CURRENTS_API_KEY")
-CURRENTS_PROJECT_ID = os.getenv("CURRENTS_PROJECT_ID")
-HEADERS = {"Authorization": f"Bearer {CURRENTS_API_KEY}"}
+# Lookback windows in days; each one is only fetched if no pass was found in the previous
+HISTORY_WINDOWS_DAYS = tuple(int(days) for days in os.getenv("HISTORY_WINDOWS_DAYS", "1,2,5").split(","))
 
 
-def get_test_history(spec_path, test_title, run_timestamp, group_id):
-    # print(f"GET_TEST_HISTORY spec: {spec}, test_name: {test_name}, run_timestamp: {run_timestamp}")
-    from datetime import datetime, timedelta
+def parse_run_timestamp(run_timestamp):
     # Check if the run_timestamp is a valid value
     if run_timestamp == "unknown" or not run_timestamp or not isinstance(run_timestamp, str):
         # If the timestamp is "unknown", not provided, or not a valid string, use the current timestamp
         print(f"Warning: run_timestamp is invalid, using the current timestamp.{run_timestamp}")
-        run_timestamp = datetime.utcnow().isoformat()  # Default to the current time in UTC
-    else:
-        # If the timestamp is provided, ensure it's in the right format
-        try:
-            run_timestamp = datetime.fromisoformat(run_timestamp.replace("Z", ""))
-        except ValueError as e:
-            print(f"Error: Invalid timestamp format for run_timestamp: {run_timestamp}")
-            raise e
-
-    spec_path = str(spec_path)
-    test_title = str(test_title)
+        return datetime.utcnow()  # Default to the current time in UTC
 
+    # If the timestamp is provided, ensure it's in the right format
     try:
-        headers = {"Authorization": f"Bearer {CURRENTS_API_KEY}"}
-
-        # Retrieve signature dynamically
-        signature_url = "https://api.currents.dev/v1/signature/test"
-        signature_payload = {
-            "projectId": CURRENTS_PROJECT_ID,
-            "specFilePath": spec_path,
-            "testTitle": test_title
-        }
-        try:
-            signature_response = retry_request(requests.post, signature_url, headers=headers, json=signature_payload, timeout=10)
-            signature_data = signature_response.json().get("data", {})
-            signature = signature_data.get("signature")
-            # print('Signature:', signature)
-            if not signature:
-                raise ValueError("Signature not found in response.")
-        except Exception as e:
-            return {"raw_history": [], "error": f"Failed to fetch signature: {e}"}
-
-        # Set date range (last 5 days)
-        date_end = run_timestamp
-        date_start = date_end - timedelta(days=5)
-        date_start_str = date_start.isoformat() + "Z"
-        date_end_str = date_end.isoformat() + "Z"
-
-        history_url = f"https://api.currents.dev/v1/test-results/{signature}"
-
-        # Pagination logic - fetch all pages of results
-        all_results = []
+        return datetime.fromisoformat(run_timestamp.replace("Z", ""))
+    except ValueError as e:
+        print(f"Error: Invalid timestamp format for run_timestamp: {run_timestamp}")
+        raise e
+
+
+def get_test_signature(spec_path, test_title):
+    """Look up the Currents signature that identifies a test across runs."""
+    client = get_client()
+    signature_url = f"{client.api_url}/signature/test"
+    signature_payload = {
+        "projectId": client.project_id,
+        "specFilePath": str(spec_path),
+        "testTitle": str(test_title)
+    }
+    signature_response = retry_request(get_session().post, signature_url, headers=client.headers, json=signature_payload, timeout=10)
+    signature_data = signature_response.json().get("data", {})
+    signature = signature_data.get("signature")
+    if not signature:
+        raise ValueError("Signature not found in response.")
+    return signature
+
+
+def iter_history_pages(signature, run_timestamp, windows=HISTORY_WINDOWS_DAYS):
+    """
+    Lazily yield pages of a signature's results, newest first and unfiltered.
+
+    The lookback starts narrow and widens one window at a time (e.g. last day,
+    then days 1-2, then days 2-5), so callers that stop early never pay for the
+    older pages.
+    """
+    client = get_client()
+    history_url = f"{client.api_url}/test-results/{signature}"
+    window_end = run_timestamp
+
+    for days in windows:
+        window_start = run_timestamp - timedelta(days=days)
         params = {
-            "date_start": date_start_str,
-            "date_end": date_end_str,
+            "date_start": window_start.isoformat() + "Z",
+            "date_end": window_end.isoformat() + "Z",
         }
 
-        # Initial request to fetch the first page of results
+        # Pagination logic - fetch pages until the window is exhausted
         while True:
-            response = retry_request(requests.get, history_url, headers=headers, params=params, timeout=10)
-            data = response.json().get("data", [])
-            
+            response = retry_request(get_session().get, history_url, headers=client.headers, params=dict(params), timeout=10)
+            body = response.json()
+            data = body.get("data", [])
+
             if not data:
                 break  # No more results to fetch
 
-            all_results.extend(data)
+            yield data
 
             # Check for the presence of pagination fields in the response
-            next_cursor = response.json().get("meta", {}).get("next_cursor")
+            next_cursor = body.get("meta", {}).get("next_cursor")
             if next_cursor:
                 params["starting_after"] = next_cursor  # Use next_cursor to fetch the next page
             else:
                 break  # No more pages, break the loop
 
-        # Filter results by branch, tags, and group_id if filters are provided
-        filter_branches = os.getenv("FILTER_BRANCHES", "").split(",") if os.getenv("FILTER_BRANCHES") else []
-        filter_tags = os.getenv("FILTER_TAGS", "").split(",") if os.getenv("FILTER_TAGS") else []
-        
-        def matches_filters(result):
-            # Check branch filter
-            branch_match = not filter_branches or result.get("commit", {}).get("branch") in filter_branches
-            
-            # Check tags filter
-            tags = result.get("tags", [])
-            tag_match = not filter_tags or any(tag in tags for tag in filter_tags)
-            
-            # Check group_id filter - if provided in function arguments
-            group_id_match = not group_id or result.get("groupId") == group_id
-            
-            return branch_match and tag_match and group_id_match
-
-        all_results = [r for r in all_results if matches_filters(r)]
-
-        # Now process the fetched history data
-        latest_commit = all_results[0].get("commit", {}) if all_results else {}
-        author = latest_commit.get("authorName")
-        last_pass_commit_sha = None
-        last_pass_date = None
-        consecutive_failures = 0
-
-        for result in all_results:
-            if result.get("status") == "failed":
-                consecutive_failures += 1
-            elif result.get("status") == "passed":
-                last_pass_commit_sha = result.get("commit", {}).get("sha")
-                last_pass_date = result.get("createdAt")
-                break
-
-        return {
-            "raw_history": all_results,
-            "latest_author": author,
-            "lastPassCommitSHA": last_pass_commit_sha,
-            "lastPassDate": last_pass_date,
-            "consecutiveFailures": consecutive_failures + 1 # + 1 to include the current failure
-        }
+        window_end = window_start
+
+
+class SharedHistory:
+    """
+    Thread-safe, replayable view over `iter_history_pages`. Several consumers
+    (e.g. one per group) can iterate the same signature's history; a page is
+    downloaded once, and only when the furthest consumer actually needs it.
+    """
+
+    def __init__(self, pages):
+        self.records = []
+        self.pages_fetched = 0
+        self._pages = pages
+        self._exhausted = False
+        self._error = None
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self.records):
+                yield self.records[i]
+                i += 1
+                continue
+            with self._lock:
+                if i < len(self.records):
+                    continue
+                if self._error:
+                    raise self._error
+                if self._exhausted:
+                    return
+                try:
+                    page = next(self._pages, None)
+                except Exception as e:
+                    self._error = e
+                    raise
+                if page is None:
+                    self._exhausted = True
+                    return
+                self.pages_fetched += 1
+                self.records.extend(page)
+
+
+def iter_test_history(signature, run_timestamp, group_id=None):
+    """Lazily yield a test's history records that match the branch, tag and group filters."""
+    for page in iter_history_pages(signature, run_timestamp):
+        for result in page:
+            if matches_history_filters(result, group_id):
+                yield result
+
+
+def matches_history_filters(result, group_id):
+    """Check a history record against the client's history filters (FILTER_BRANCHES, FILTER_TAGS) and the test's group."""
+    client = get_client()
+    filter_branches = client.history_branches
+    filter_tags = client.history_tags
+
+    # Check branch filter
+    branch_match = not filter_branches or result.get("commit", {}).get("branch") in filter_branches
+
+    # Check tags filter
+    tags = result.get("tags", [])
+    tag_match = not filter_tags or any(tag in tags for tag in filter_tags)
+
+    # Check group_id filter - if provided in function arguments
+    group_id_match = not group_id or result.get("groupId") == group_id
+
+    return branch_match and tag_match and group_id_match
+
+
+def summarize_test_history(history, group_id):
+    """
+    Work out the current failure streak from an iterable of raw history records.
+    Records are filtered as they arrive and iteration stops at the first pass, so
+    a lazy `history` is only paged as far as the streak needs.
+    """
+    matching_results = []
+    last_pass_commit_sha = None
+    last_pass_date = None
+    consecutive_failures = 0
+
+    for result in history:
+        if not matches_history_filters(result, group_id):
+            continue
+        matching_results.append(result)
+
+        if result.get("status") == "failed":
+            consecutive_failures += 1
+        elif result.get("status") == "passed":
+            last_pass_commit_sha = result.get("commit", {}).get("sha")
+            last_pass_date = result.get("createdAt")
+            break
+
+    latest_commit = matching_results[0].get("commit", {}) if matching_results else {}
+    author = latest_commit.get("authorName")
+
+    return {
+        "raw_history": matching_results,
+        "latest_author": author,
+        "lastPassCommitSHA": last_pass_commit_sha,
+        "lastPassDate": last_pass_date,
+        "consecutiveFailures": consecutive_failures + 1 # + 1 to include the current failure
+    }
+
+
+def get_test_history(spec_path, test_title, run_timestamp, group_id):
+    # print(f"GET_TEST_HISTORY spec: {spec}, test_name: {test_name}, run_timestamp: {run_timestamp}")
+    run_timestamp = parse_run_timestamp(run_timestamp)
+
+    try:
+        # Retrieve signature dynamically
+        try:
+            signature = get_test_signature(spec_path, test_title)
+        except Exception as e:
+            return {"raw_history": [], "error": f"Failed to fetch signature: {e}"}
+
+        history = SharedHistory(iter_history_pages(signature, run_timestamp))
+        return summarize_test_history(history, group_id)
     except Exception as e:
-        return {"raw_history": [], "error": str(e)}
\ No newline at end of file
+        return {"raw_history": [], "error": str(e)}
@@ -1,28 +1,26 @@
 import requests
-from currents.fetch_instance_tests import fetch_instance_tests
+from currents.fetch_instance_tests import fetch_instance_tests_async
+from currents.circuit_breaker import CircuitOpenError
 from currents.retry_request import retry_request
-import concurrent.futures
+from currents.client import get_client
+from currents.http_engine import get_session, run_in_pool
+from currents.plan_instance_fetches import plan_instance_fetches
+from currents.test_record import TestRecord
+from helpers.data.test_warehouse import get_test_warehouse
+import asyncio
 from tqdm import tqdm
-import os
 import sys
 
 
-CURRENTS_API_KEY = os.getenv("CURRENTS_API_KEY")
-CURRENTS_PROJECT_ID = os.getenv("CURRENTS_PROJECT_ID")
-HEADERS = {"Authorization": f"Bearer {CURRENTS_API_KEY}"}
-MAX_WORKERS = 5
-LAST_RUN_LIMIT = 10
-
-def get_test_results_for_run(run_id):
-    run_url = f"https://api.currents.dev/v1/runs/{run_id}"
-    headers = {"Authorization": f"Bearer {CURRENTS_API_KEY}"}
+def get_run_specs(run_id):
+    client = get_client()
+    run_url = f"{client.api_url}/runs/{run_id}"
 
     try:
-        # print(f"Fetching test results for run {run_id}...")
-        run_response = retry_request(requests.get, run_url, headers=headers, timeout=10)
+        run_response = retry_request(get_session().get, run_url, headers=client.headers, timeout=10)
         run_data = run_response.json().get("data", {})
         specs = run_data.get("specs", [])
-        
+
         if not specs:
             print(f"No specs found for run {run_id}")
             return []
@@ -31,37 +29,124 @@ def get_test_results_for_run(run_id):
         print(f"Error fetching run data for run {run_id}: {e}", file=sys.stderr)
         return []
 
+    return specs
+
+
+async def stream_test_results_for_runs_async(run_ids, on_tests, on_run_complete=None, changed_only=False, on_instance_error=None, on_plan=None):
+    """
+    Fetch the test results of several runs at once and hand them over as they arrive.
+    Every instance of every run is queued on the shared HTTP pool together, so the
+    runs download side by side.
+
+    Args:
+        run_ids (list): Run ids to fetch.
+        on_tests (callable): Called as `on_tests(run_index, tests)` for each downloaded
+            instance, with the tests as compact `TestRecord`s.
+        on_run_complete (callable, optional): Called as `on_run_complete(run_index)` once
+            every instance of that run has been handed to `on_tests`.
+        changed_only (bool): For the leading (current, previous) pair, only download the
+            spec instances whose run-level summaries show they can affect the diff.
+            Any further runs are downloaded in full.
+        on_instance_error (callable, optional): Called as `on_instance_error(run_index,
+            instance_id, error)` for an instance that couldn't be downloaded; its
+            tests are missing from the results.
+        on_plan (callable, optional): Called with the changed-only plan (`planned`,
+            `total` and `skipped` instance counts) before any download starts.
+
+    Every downloaded instance is also queued for the local test warehouse (see
+    `get_test_warehouse`).
+    """
+    warehouse = get_test_warehouse()
+    specs_per_run = await asyncio.gather(*(run_in_pool(get_run_specs, run_id) for run_id in run_ids))
+
     # Collect test instance IDs
-    instance_ids = [spec.get("instanceId") for spec in specs if spec.get("instanceId")]
-    # print(f"Found {len(instance_ids)} test instances in run {run_id}")
-
-    results = []
-    
-    # Process instance IDs sequentially instead of using ThreadPoolExecutor
-    # Use ThreadPoolExecutor for parallel fetching of test instances
-    with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(instance_ids))) as executor:
-        # Submit all fetch tasks
-        future_to_instance = {executor.submit(fetch_instance_tests, instance_id): instance_id for instance_id in instance_ids}
-        
-        # Process results as they complete
-        for future in tqdm(concurrent.futures.as_completed(future_to_instance), total=len(instance_ids), desc=f"    ↪ [{run_id}] {len(instance_ids)} tests"):
-            instance_id = future_to_instance[future]
-            try:
-                test_instance = future.result()
-                
-                # Filter only relevant data from each test
-                for test in test_instance:
-                    results.append({
-                        "name": test["name"],
-                        "title": test["title"],
-                        "testId": test["testId"],
-                        "status": test["state"],
-                        "groupId": test["groupId"],
-                        "spec": test["spec"],
-                        # "signature": test["signature"],
-                        "attempts": test["attempts"],
-                    })
-            except Exception as e:
+    instance_ids_per_run = [
+        [spec.get("instanceId") for spec in specs if spec.get("instanceId")]
+        for specs in specs_per_run
+    ]
+    if changed_only and len(run_ids) >= 2:
+        current_ids, previous_ids, plan = plan_instance_fetches(*specs_per_run[:2])
+        instance_ids_per_run[:2] = [current_ids, previous_ids]
+        print(f"    ↪ changed-only: fetching {plan['planned']} of {plan['total']} instances ({plan['skipped']} skipped)")
+        if on_plan:
+            on_plan(plan)
+
+    total = sum(len(instance_ids) for instance_ids in instance_ids_per_run)
+    remaining = [len(instance_ids) for instance_ids in instance_ids_per_run]
+
+    async def fetch(run_index, instance_id):
+        try:
+            test_instance = await fetch_instance_tests_async(instance_id)
+        except Exception as e:
+            # With the breaker open every remaining instance fails the same way; it's reported once, as partial data
+            if not isinstance(e, CircuitOpenError):
                 print(f"Error processing instance {instance_id}: {e}", file=sys.stderr)
+            if on_instance_error:
+                on_instance_error(run_index, instance_id, e)
+            test_instance = []
+        return run_index, test_instance
+
+    tasks = [
+        fetch(run_index, instance_id)
+        for run_index, instance_ids in enumerate(instance_ids_per_run)
+        for instance_id in instance_ids
+    ]
+
+    if on_run_complete:
+        for run_index, count in enumerate(remaining):
+            if count == 0:
+                on_run_complete(run_index)
+
+    with tqdm(total=total, desc=f"    ↪ [{', '.join(run_ids)}] {total} tests") as progress:
+        for next_done in asyncio.as_completed(tasks):
+            run_index, test_instance = await next_done
+
+            # Filter only relevant data from each test
+            tests = [
+                TestRecord(
+                    name=test["name"],
+                    title=test["title"],
+                    testId=test["testId"],
+                    status=test["state"],
+                    groupId=test["groupId"],
+                    spec=test["spec"],
+                    attempts=test["attempts"],
+                )
+                for test in test_instance
+            ]
+            if warehouse and tests:
+                warehouse.record_tests(run_ids[run_index], tests)
+            on_tests(run_index, tests)
+            progress.update(1)
+
+            remaining[run_index] -= 1
+            if remaining[run_index] == 0 and on_run_complete:
+                on_run_complete(run_index)
+
+
+async def get_test_results_for_runs_async(run_ids, changed_only=False, compact=False, on_instance_error=None):
+    """
+    Fetch the complete test results of several runs at once.
+
+    Args:
+        compact (bool): Return `TestRecord`s instead of plain dicts.
+        on_instance_error (callable, optional): See `stream_test_results_for_runs_async`.
+
+    Returns:
+        list: One list of test results per run id, in the same order as `run_ids`.
+    """
+    results = [[] for _ in run_ids]
+
+    def on_tests(run_index, tests):
+        results[run_index].extend(tests if compact else (test.to_dict() for test in tests))
+
+    await stream_test_results_for_runs_async(run_ids, on_tests, changed_only=changed_only, on_instance_error=on_instance_error)
+    return results
+
+
+def get_test_results_for_runs(run_ids, changed_only=False, compact=False):
+    return asyncio.run(get_test_results_for_runs_async(list(run_ids), changed_only, compact))
+
 
-    return results
\ No newline at end of file
+def get_test_results_for_run(run_id, compact=False):
+    return get_test_results_for_runs([run_id], compact=compact)[0]
@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import os
+import threading
+import time
+from currents.http_engine import MAX_CONCURRENCY, run_in_pool
+from helpers.tools.metrics import metrics
+
+HEDGING_ENABLED = os.getenv("CURRENTS_HEDGE", "on").lower() not in ("off", "0", "false")
+# A request still running past this quantile of recent latencies gets a second copy
+HEDGE_QUANTILE = float(os.getenv("CURRENTS_HEDGE_QUANTILE", "0.95"))
+# Latencies to observe before hedging at all, and the shortest deadline used
+HEDGE_MIN_SAMPLES = int(os.getenv("CURRENTS_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("CURRENTS_HEDGE_MIN_DELAY", "0.5"))
+# Most hedges allowed, as a share of calls, so a slow API doesn't get double the load
+HEDGE_BUDGET = float(os.getenv("CURRENTS_HEDGE_BUDGET", "0.1"))
+RECENT_LATENCIES = 200
+
+_hedge_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=max(2, MAX_CONCURRENCY // 4), thread_name_prefix="currents-hedge"
+)
+
+
+def discard_result(future):
+    # Retrieve the losing copy's outcome so a late failure isn't logged as unhandled
+    if not future.cancelled():
+        future.exception()
+
+
+class Hedger:
+    """
+    Hedged requests for one endpoint: when a call runs past the p95 of recent
+    latencies, a second identical call is sent and whichever finishes first wins.
+
+    Latency is measured from when a pool worker picks the call up, so time spent
+    queued behind other downloads neither counts towards the deadline nor
+    inflates the p95. Hedges run on a few threads of their own: queued behind the
+    primaries on the shared pool, they would start too late to help. A blocking
+    request can't be cancelled, so the loser runs to completion and its result
+    is dropped.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = collections.deque(maxlen=RECENT_LATENCIES)
+        self.calls = 0
+        self.hedged = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def deadline(self):
+        """Seconds to wait before hedging, or None while there's too little data (or budget) to hedge."""
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES or self.hedged >= HEDGE_BUDGET * self.calls:
+                return None
+            ordered = sorted(self.latencies)
+            return max(HEDGE_MIN_DELAY, ordered[min(len(ordered) - 1, int(HEDGE_QUANTILE * len(ordered)))])
+
+    async def call(self, func, *args, **kwargs):
+        """Await `func(*args, **kwargs)` on the HTTP pool, hedging it if it runs long."""
+        with self._lock:
+            self.calls += 1
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        primary = asyncio.ensure_future(run_in_pool(self._timed, lambda: loop.call_soon_threadsafe(started.set), func, *args, **kwargs))
+        if not HEDGING_ENABLED:
+            return await primary
+
+        # The deadline runs from when a worker picks the call up, using the latencies known by then
+        await started.wait()
+        deadline = self.deadline()
+        if deadline is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=deadline)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.hedged += 1
+        hedge = loop.run_in_executor(_hedge_executor, functools.partial(contextvars.copy_context().run, self._timed, None, func, *args, **kwargs))
+        pending = {primary, hedge}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                break
+        for future in pending:
+            future.add_done_callback(discard_result)
+        if not succeeded:
+            return primary.result()  # Both copies failed: raise the primary's error
+
+        winner = primary if primary in succeeded else hedge
+        if winner is hedge:
+            with self._lock:
+                self.wins += 1
+        metrics.record_hedge(self.name, won=winner is hedge)
+        return winner.result()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "hedged": self.hedged, "wins": self.wins}
+
+    def _timed(self, on_start, func, *args, **kwargs):
+        if on_start:
+            on_start()
+        started_at = time.perf_counter()
+        result = func(*args, **kwargs)
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started_at)
+        return result
+
+
+instance_hedger = Hedger("/v1/instances/{id}")
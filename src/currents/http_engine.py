@@ -0,0 +1,141 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from currents.client import get_client
+
+# One concurrency limit for every Currents call in the process
+MAX_CONCURRENCY = int(os.getenv("CURRENTS_MAX_CONCURRENCY", "16"))
+
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide `requests.Session`. Its connection pool keeps TLS
+    connections to the Currents API alive, so concurrent fetches reuse sockets
+    instead of handshaking for every request.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class FairExecutor(concurrent.futures.Executor):
+    """
+    Thread pool that keeps one queue per client and serves them round-robin.
+
+    A plain `ThreadPoolExecutor` is first come, first served, so a project that
+    queues 2,000 instance downloads would hold the workers (and with them the
+    rate-limit budget) until it's done, while a smaller project waits behind it.
+    Here each client with queued work gets the next free worker in turn. Work
+    within one client stays in submission order. Calls run in the submitter's
+    context, so they see the same `get_client()`.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix="fair-pool"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.served = collections.Counter()
+        self._queues = {}
+        self._turns = collections.deque()
+        self._threads = []
+        self._idle = 0
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        work = (future, contextvars.copy_context(), fn, args, kwargs)
+        tenant = _tenant()
+        with self._cond:
+            if tenant not in self._queues:
+                self._queues[tenant] = collections.deque()
+                self._turns.append(tenant)
+            self._queues[tenant].append(work)
+            self._pending += 1
+            if self._pending > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"{self.thread_name_prefix}_{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        """Calls served per client, and how many are still queued."""
+        with self._cond:
+            return {
+                "served": dict(self.served),
+                "queued": {tenant: len(queue) for tenant, queue in self._queues.items()},
+            }
+
+    def _next(self):
+        with self._cond:
+            while not self._turns:
+                self._idle += 1
+                self._cond.wait()
+                self._idle -= 1
+            tenant = self._turns.popleft()
+            queue = self._queues[tenant]
+            work = queue.popleft()
+            self._pending -= 1
+            if queue:
+                self._turns.append(tenant)
+            else:
+                del self._queues[tenant]
+            self.served[tenant] += 1
+            return work
+
+    def _work(self):
+        while True:
+            future, context, fn, args, kwargs = self._next()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+def _tenant():
+    return get_client().label
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = FairExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="currents-http")
+        return _executor
+
+
+def pool_stats():
+    return _get_executor().stats()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """
+    Await a blocking call on the shared HTTP worker pool. The pool size is the
+    global in-flight limit, no matter how many event loops or callers there are.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def submit_to_pool(func, *args, **kwargs):
+    """Schedule a blocking call on the shared HTTP worker pool and return its `concurrent.futures.Future`."""
+    return _get_executor().submit(func, *args, **kwargs)
@@ -0,0 +1,117 @@
+import json
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; without it we parse the whole body at once
+    ijson = None
+
+# Longest error message kept per attempt; stacks and artifacts are dropped entirely
+ERROR_SUMMARY_CHARS = 500
+
+TEST_PREFIX = "data.results.tests.item"
+ATTEMPT_PREFIX = f"{TEST_PREFIX}.attempts.item"
+
+
+class ChunkReader:
+    """File-like wrapper so ijson can consume a `response.iter_content()` generator."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def summarize_error(error):
+    if not isinstance(error, dict) or not error.get("message"):
+        return None
+    return {"message": str(error["message"])[:ERROR_SUMMARY_CHARS]}
+
+
+def project_instance(instance_data):
+    """Reduce a fully parsed `/instances/{id}` payload to the fields the analysis uses."""
+    results = instance_data.get("results") or {}
+    return {
+        "groupId": instance_data.get("groupId"),
+        "spec": instance_data.get("spec"),
+        "signature": instance_data.get("signature"),
+        "completedAt": instance_data.get("completedAt"),
+        "results": {
+            "stats": {"wallClockEndedAt": (results.get("stats") or {}).get("wallClockEndedAt")},
+            "tests": [
+                {
+                    "title": test.get("title"),
+                    "testId": test.get("testId"),
+                    "state": test.get("state"),
+                    "attempts": [
+                        {"state": attempt.get("state"), "error": summarize_error(attempt.get("error"))}
+                        for attempt in test.get("attempts") or []
+                    ],
+                }
+                for test in results.get("tests") or []
+            ],
+        },
+    }
+
+
+def parse_instance_stream(chunks):
+    """
+    Pull title, testId, state and a bounded error summary out of an `/instances/{id}`
+    body while it downloads, without ever building the full object tree.
+    Returns the same shape as `project_instance`.
+    """
+    instance = {"groupId": None, "spec": None, "signature": None, "completedAt": None,
+                "results": {"stats": {"wallClockEndedAt": None}, "tests": []}}
+    tests = instance["results"]["tests"]
+    test = None
+    attempt = None
+
+    for prefix, event, value in ijson.parse(ChunkReader(chunks)):
+        if prefix == TEST_PREFIX:
+            if event == "start_map":
+                test = {"title": [], "testId": None, "state": None, "attempts": []}
+            elif event == "end_map":
+                tests.append(test)
+                test = None
+        elif test is not None and prefix.startswith(TEST_PREFIX + "."):
+            field = prefix[len(TEST_PREFIX) + 1:]
+            if field == "title.item":
+                test["title"].append(value)
+            elif field == "title" and event in ("string", "number"):
+                test["title"] = value
+            elif field in ("testId", "state"):
+                test[field] = value
+            elif prefix == ATTEMPT_PREFIX:
+                if event == "start_map":
+                    attempt = {"state": None, "error": None}
+                elif event == "end_map":
+                    test["attempts"].append(attempt)
+                    attempt = None
+            elif attempt is not None:
+                if prefix == f"{ATTEMPT_PREFIX}.state":
+                    attempt["state"] = value
+                elif prefix == f"{ATTEMPT_PREFIX}.error.message" and value:
+                    attempt["error"] = {"message": str(value)[:ERROR_SUMMARY_CHARS]}
+        elif prefix in ("data.groupId", "data.spec", "data.signature", "data.completedAt"):
+            instance[prefix[len("data."):]] = value
+        elif prefix == "data.results.stats.wallClockEndedAt":
+            instance["results"]["stats"]["wallClockEndedAt"] = value
+
+    return instance
+
+
+def parse_instance_payload(chunks):
+    """Parse an instance body incrementally when ijson is installed, otherwise in one go."""
+    if ijson is not None:
+        return parse_instance_stream(chunks)
+    return project_instance(json.loads(b"".join(chunks)).get("data", {}))
@@ -0,0 +1,58 @@
+def spec_key(spec):
+    return (spec.get("groupId"), spec.get("spec"))
+
+
+def spec_stats(spec):
+    return (spec.get("results") or {}).get("stats") or {}
+
+
+def needs_fetch(current_spec, previous_spec):
+    """
+    Decide from run-level summaries alone whether a spec can change the diff.
+
+    A spec that passed in both runs with the same number of tests can't produce
+    a Resolved, Still Failing or New Failure entry, and can't add New Tests.
+    (The one case summaries can't see is a test renamed without changing the
+    count, which would show up as a new test.)
+    """
+    if previous_spec is None:
+        return True  # New spec: every test in it is a new test
+
+    current_stats = spec_stats(current_spec)
+    previous_stats = spec_stats(previous_spec)
+    if not current_stats or not previous_stats:
+        return True  # No summary to go on, so fetch to be safe
+
+    if current_stats.get("failures") or previous_stats.get("failures"):
+        return True
+    return current_stats.get("tests") != previous_stats.get("tests")
+
+
+def plan_instance_fetches(current_specs, previous_specs):
+    """
+    Pick which spec instances to download when diffing two runs.
+
+    Args:
+        current_specs (list): `specs` from the current run's `/runs/{id}` payload.
+        previous_specs (list): `specs` from the previous run's payload.
+
+    Returns:
+        tuple: (current instance ids, previous instance ids, stats dict with
+        `planned`, `total` and `skipped` instance counts).
+    """
+    previous_by_key = {spec_key(spec): spec for spec in previous_specs}
+    current_ids = []
+    previous_ids = []
+
+    for spec in current_specs:
+        previous_spec = previous_by_key.get(spec_key(spec))
+        if not needs_fetch(spec, previous_spec):
+            continue
+        if spec.get("instanceId"):
+            current_ids.append(spec["instanceId"])
+        if previous_spec and previous_spec.get("instanceId"):
+            previous_ids.append(previous_spec["instanceId"])
+
+    total = sum(1 for spec in current_specs if spec.get("instanceId")) + sum(1 for spec in previous_specs if spec.get("instanceId"))
+    planned = len(current_ids) + len(previous_ids)
+    return current_ids, previous_ids, {"planned": planned, "total": total, "skipped": total - planned}
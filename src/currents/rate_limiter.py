@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Process-wide token bucket shared by every Currents request.
+
+    The bucket starts from a conservative guess and re-learns its budget from the
+    `X-RateLimit-*` headers of each response: the remaining requests are spread
+    evenly over the time left until the window resets, so workers are paced ahead
+    of time instead of all hitting a 429 together.
+    """
+
+    def __init__(self, rate=5.0, burst=5):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.total_requests = 0
+        self.paused_until = 0.0
+        self._updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        with self._cond:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    pause = self.paused_until - time.time()
+                    if pause <= 0 and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.total_requests += 1
+                        return
+                    wait = pause if pause > 0 else (1 - self.tokens) / self.rate
+                    self._cond.wait(timeout=max(wait, 0.01))
+            finally:
+                self.waiting -= 1
+
+    def update_from_headers(self, headers):
+        """Re-derive the refill rate from a response's rate-limit headers."""
+        try:
+            limit = int(headers.get("X-RateLimit-Limit"))
+            remaining = int(headers.get("X-RateLimit-Remaining"))
+            reset = float(headers.get("X-RateLimit-Reset"))
+        except (TypeError, ValueError):
+            return
+
+        window = max(reset - time.time(), 1.0)
+        if remaining <= 0:
+            # Spent: hold everyone until the reset, then pace the fresh window's budget
+            # rather than crawling along at a rate derived from "0 left"
+            self.pause_until(reset)
+            with self._cond:
+                self.rate = max(limit / window, 0.1)
+                self.burst = max(1, min(limit, int(self.rate) + 1))
+                self._cond.notify_all()
+            return
+
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = max(remaining / window, 0.1)
+            self.burst = max(1, min(limit, remaining, int(self.rate) + 1))
+            self.tokens = min(self.tokens, self.burst, float(remaining))
+            self._cond.notify_all()
+
+    def pause_until(self, reset_time):
+        """Hold every caller until `reset_time` (epoch seconds) after the budget ran out."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, reset_time)
+            self.tokens = 0.0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "rate": round(self.rate, 2),
+                "burst": self.burst,
+                "queue_depth": self.waiting,
+                "peak_queue_depth": self.peak_waiting,
+                "total_requests": self.total_requests,
+            }
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+rate_limiter = RateLimiter(
+    rate=float(os.getenv("CURRENTS_RATE_LIMIT", "5")),
+    burst=int(os.getenv("CURRENTS_RATE_BURST", "5")),
+)
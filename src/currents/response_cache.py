@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sys
+import requests
+from requests.structures import CaseInsensitiveDict
+from helpers.tools.disk_cache import DiskCache
+
+# Only these Currents endpoints return data that freezes once a run completes
+CACHEABLE_PATHS = ("/v1/runs/", "/v1/instances/")
+FINISHED_STATES = {"COMPLETE", "CANCELED", "TIMEOUT"}
+
+_cache = None
+
+
+def get_response_cache():
+    """
+    Return the process-wide response cache, or None when caching is disabled
+    (`--no-cache` flag or `CURRENTS_CACHE=off`).
+    """
+    global _cache
+    if "--no-cache" in sys.argv or os.getenv("CURRENTS_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    if _cache is None:
+        cache_dir = os.getenv("CURRENTS_CACHE_DIR", ".cache")
+        max_mb = int(os.getenv("CURRENTS_CACHE_MAX_MB", "512"))
+        _cache = DiskCache(os.path.join(cache_dir, "currents_responses.sqlite"), max_mb * 1024 * 1024)
+    return _cache
+
+
+def get_cache_stats():
+    """Hit/miss/eviction counters for the response cache (zeros when disabled)."""
+    cache = get_response_cache()
+    if cache is None:
+        return {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    return dict(cache.stats)
+
+
+def cache_key(method, url, kwargs):
+    """Hash everything that identifies a request (method, url, params and body) into a stable key."""
+    identity = json.dumps(
+        {
+            "method": method,
+            "url": url,
+            "params": kwargs.get("params"),
+            "json": kwargs.get("json"),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(method, url):
+    return method == "GET" and any(path in url for path in CACHEABLE_PATHS)
+
+
+def lookup_response(method, url, kwargs):
+    """Return a cached `requests.Response` for this request, or None on a miss."""
+    cache = get_response_cache()
+    if cache is None or not is_cacheable(method, url):
+        return None
+
+    entry = cache.get(cache_key(method, url, kwargs))
+    if entry is None:
+        return None
+
+    meta, body = entry.split(b"\n", 1)
+    meta = json.loads(meta)
+
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = body
+    response._content_consumed = True  # lets iter_content() replay the cached body
+    response.from_cache = True
+    return response
+
+
+def store_response(method, url, kwargs, response, body=None, data=None):
+    """
+    Cache a successful response. Finished runs and instances never expire;
+    anything still in progress gets a short TTL (`CURRENTS_CACHE_TTL`, seconds).
+
+    Callers that streamed the body themselves pass the raw `body` bytes and the
+    (possibly partial) parsed `data` they already have, so it isn't parsed twice.
+    """
+    cache = get_response_cache()
+    if cache is None or not is_cacheable(method, url) or response.status_code != 200:
+        return
+
+    if body is None:
+        body = response.content
+    if data is None:
+        try:
+            data = json.loads(body).get("data", {})
+        except ValueError:
+            return
+
+    ttl = None if is_finished(data) else int(os.getenv("CURRENTS_CACHE_TTL", "60"))
+    meta = json.dumps({"status": response.status_code, "headers": dict(response.headers)}).encode("utf-8")
+    cache.set(cache_key(method, url, kwargs), meta + b"\n" + body, ttl=ttl)
+
+
+def is_finished(data):
+    """
+    Decide whether a run or instance payload can no longer change.
+    Runs report a `completionState`; instances are done once their results carry an end time.
+    """
+    if not isinstance(data, dict):
+        return False
+    if "completionState" in data:
+        return data.get("completionState") in FINISHED_STATES
+    if data.get("completedAt"):
+        return True
+    stats = (data.get("results") or {}).get("stats") or {}
+    return bool(stats.get("wallClockEndedAt"))
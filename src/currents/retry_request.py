@@ -1,37 +1,76 @@
 import time
 import random
 import requests
+from currents.response_cache import lookup_response, store_response
+from currents.rate_limiter import rate_limiter
+from currents.circuit_breaker import CircuitOpenError, get_breaker
+from helpers.tools.metrics import metrics
 
 def retry_request(func, *args, **kwargs):
+    # Serve immutable run/instance payloads from the local cache when we have them
+    method = getattr(func, "__name__", "").upper()
+    url = args[0] if args else kwargs.get("url", "")
+    cached = lookup_response(method, url, kwargs)
+    if cached is not None:
+        metrics.record_cache_hit(url)
+        return cached
+
+    breaker = get_breaker(url)
     retries = 5  # Number of retries
     for attempt in range(retries):
+        # Fail fast while the endpoint is down instead of queueing for a doomed request
+        probe = breaker.before_request()
         try:
-            # Perform the API call
+            # Wait for our turn in the shared budget, then perform the API call
+            rate_limiter.acquire()
+            started_at = time.perf_counter()
             response = func(*args, **kwargs)
+            # Streamed bodies haven't been read yet; the caller records their bytes
+            size = None if kwargs.get("stream") else len(response.content or b"")
+            metrics.record_request(url, response.status_code, time.perf_counter() - started_at, size)
+            rate_limiter.update_from_headers(response.headers)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
 
             # Check if the response status is 429 (rate limit exceeded)
             if response.status_code == 429:
                 remaining = int(response.headers.get("X-RateLimit-Remaining", 0))
                 limit = int(response.headers.get("X-RateLimit-Limit", 1))
 
-                # If we're out of requests, we should back off and wait for the reset time
+                # If we're out of requests, pause every worker until the reset time
                 if remaining == 0:
                     reset_time = int(response.headers.get("X-RateLimit-Reset", time.time()))
                     wait_time = max(1, reset_time - time.time())  # Wait until reset time
                     print(f"Rate limit reached. Waiting for {wait_time} seconds.")
-                    time.sleep(wait_time)
-                    continue  # Retry the request after waiting
+                    rate_limiter.pause_until(time.time() + wait_time)
+                    metrics.record_retry(url)
+                    continue  # Retry the request once the limiter lets us through
 
             # If we get a successful response, return it
             response.raise_for_status()
+            if not kwargs.get("stream"):
+                store_response(method, url, kwargs, response)  # Streamed bodies are cached by the caller
             return response
 
         except requests.RequestException as e:
+            if e.response is not None and 400 <= e.response.status_code < 500 and e.response.status_code not in (408, 429):
+                raise  # A bad id or request won't get better by retrying it
+            if e.response is None:
+                breaker.record_failure()  # Connection errors and timeouts; 5xx were counted above
+            if breaker.is_open:
+                # The endpoint is down; backing off and retrying would only hold this caller up
+                raise CircuitOpenError(f"Circuit open for {breaker.name}: {e}") from e
             if attempt < retries - 1:
+                metrics.record_retry(url)
                 # Exponential backoff if there is a request error
                 backoff_time = random.uniform(1, 2 ** attempt)  # Exponential backoff
                 print(f"Request failed. Retrying in {backoff_time:.2f} seconds... Error: {e}")
                 time.sleep(backoff_time)
             else:
                 print(f"Max retries reached. Final error: {e}")
-                raise e  # After max retries, raise the exception
\ No newline at end of file
+                raise e  # After max retries, raise the exception
+        finally:
+            if probe:
+                breaker.end_probe()
\ No newline at end of file
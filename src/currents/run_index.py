@@ -0,0 +1,258 @@
+import bisect
+import json
+import os
+import sys
+import threading
+from currents.client import get_client
+from currents.get_project_runs import get_project_runs
+
+PAGE_SIZE = 50
+# How far back the very first sync walks before relying on on-demand backfill
+INITIAL_SYNC_PAGES = int(os.getenv("RUN_INDEX_INITIAL_PAGES", "4"))
+
+
+class RunIndex:
+    """
+    Persisted, incrementally synced index of a project's runs.
+
+    Runs are stored once and posted into sorted `(createdAt, runId)` lists keyed
+    by `(branch, tag)`, `(branch, None)`, `(None, tag)` and `(None, None)`, so
+    "latest run before X matching these filters" is a bisect rather than a crawl.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.runs = {}
+        self.postings = {}
+        self.oldest_cursor = None
+        self.complete = False
+        self._lock = threading.RLock()
+        self._load()
+
+    def sync(self):
+        """
+        Fetch only runs newer than the newest one already indexed. The Currents API
+        lists runs newest first, so paging stops at the first run we have seen before.
+        Returns the number of new runs, or None if the API could not be reached.
+        """
+        with self._lock:
+            first_sync = not self.runs
+            cursor = None
+            new_runs = []
+            oldest_cursor = None
+            complete = False
+            pages = 0
+
+            while True:
+                page = get_project_runs(limit=PAGE_SIZE, ending_after=cursor)
+                if "error" in page:
+                    # Nothing from this sync is kept: a half-applied sync would make its newest
+                    # runs look known next time, and the runs after them would never be fetched
+                    print(f"Warning: run index sync failed, using local index: {page['error']}", file=sys.stderr)
+                    return None
+
+                runs = page.get("data", [])
+                reached_known = False
+                for run in runs:
+                    if run.get("runId") in self.runs:
+                        reached_known = True
+                        break
+                    new_runs.append(run)
+                pages += 1
+
+                if runs and first_sync:
+                    oldest_cursor = runs[-1].get("cursor")
+                if not page.get("has_more") or not runs:
+                    complete = first_sync
+                    break
+                if reached_known or (first_sync and pages >= INITIAL_SYNC_PAGES):
+                    break
+                cursor = runs[-1].get("cursor")
+                if not cursor:
+                    break
+
+            # The sync reached a known run (or the end of the list), so the new runs leave no gap
+            for run in new_runs:
+                self._add(run)
+            if oldest_cursor:
+                self.oldest_cursor = oldest_cursor
+            self.complete = self.complete or complete
+            if new_runs:
+                self._save()
+            return len(new_runs)
+
+    def backfill(self):
+        """Extend the index one page further into the past. Returns False once history is exhausted."""
+        with self._lock:
+            if self.complete or not self.oldest_cursor:
+                return False
+
+            page = get_project_runs(limit=PAGE_SIZE, ending_after=self.oldest_cursor)
+            if "error" in page:
+                print(f"Warning: run index backfill failed: {page['error']}", file=sys.stderr)
+                return False
+
+            runs = page.get("data", [])
+            for run in runs:
+                if run.get("runId") not in self.runs:
+                    self._add(run)
+            if runs and runs[-1].get("cursor"):
+                self.oldest_cursor = runs[-1].get("cursor")
+            if not runs or not page.get("has_more"):
+                self.complete = True
+            self._save()
+            return bool(runs)
+
+    def find_previous(self, reference_run_id, tags=None, branches=None):
+        """Return the newest indexed run older than `reference_run_id` that matches the filters, or None."""
+        with self._lock:
+            reference = self.runs.get(reference_run_id)
+            if reference is None:
+                return None
+
+            position = (reference.get("createdAt") or "", reference_run_id)
+            tag = tags[0] if tags else None
+            best = None
+            for branch in branches or [None]:
+                candidates = self.postings.get((branch, tag), [])
+                i = bisect.bisect_left(candidates, position)
+                while i > 0:
+                    i -= 1
+                    run = self.runs[candidates[i][1]]
+                    if run.get("runId") != reference_run_id and self.matches(run, tags, branches):
+                        if best is None or candidates[i] > best[0]:
+                            best = (candidates[i], run)
+                        break
+            return best[1] if best else None
+
+    def previous_run(self, reference_run_id, tags=None, branches=None):
+        """
+        Sync, then look up the run before `reference_run_id`. Older history is only
+        fetched when the reference run or a match is not indexed yet.
+        """
+        self.sync()
+        while True:
+            if reference_run_id in self.runs:
+                found = self.find_previous(reference_run_id, tags, branches)
+                if found:
+                    return found
+            if not self.backfill():
+                return None
+
+    def latest_run(self, tags=None, branches=None):
+        """Sync, then return the newest run matching the filters, backfilling only until one is found."""
+        self.sync()
+        while True:
+            with self._lock:
+                tag = tags[0] if tags else None
+                best = None
+                for branch in branches or [None]:
+                    for entry in reversed(self.postings.get((branch, tag), [])):
+                        if self.matches(self.runs[entry[1]], tags, branches):
+                            best = max(best, entry) if best else entry
+                            break
+                if best:
+                    return self.runs[best[1]]
+            if not self.backfill():
+                return None
+
+    def previous_runs(self, reference_run_id, count, tags=None, branches=None):
+        """
+        Return up to `count` matching runs before `reference_run_id`, newest first,
+        backfilling older history only when the index runs short.
+        """
+        self.sync()
+        runs = []
+        cursor = reference_run_id
+        while len(runs) < count:
+            found = self.find_previous(cursor, tags, branches) if cursor in self.runs else None
+            if found:
+                runs.append(found)
+                cursor = found.get("runId")
+            elif not self.backfill():
+                break
+        return runs
+
+    def runs_between(self, since, until, tags=None, branches=None):
+        """
+        Return the matching runs created in `[since, until]` (ISO timestamps), oldest
+        first, backfilling until the index reaches back past `since`.
+        """
+        self.sync()
+        while True:
+            indexed = self.postings.get((None, None), [])
+            if (indexed and indexed[0][0] <= since) or not self.backfill():
+                break
+
+        with self._lock:
+            tag = tags[0] if tags else None
+            found = set()
+            for branch in branches or [None]:
+                candidates = self.postings.get((branch, tag), [])
+                start = bisect.bisect_left(candidates, (since, ""))
+                end = bisect.bisect_right(candidates, (until, "\uffff"))
+                found.update(entry for entry in candidates[start:end] if self.matches(self.runs[entry[1]], tags, branches))
+            return [self.runs[run_id] for _, run_id in sorted(found)]
+
+    def matches(self, run, tags, branches):
+        if tags and not set(tags).issubset(set(run.get("tags") or [])):
+            return False
+        if branches and self._branch(run) not in branches:
+            return False
+        return True
+
+    def _branch(self, run):
+        return (run.get("meta") or {}).get("commit", {}).get("branch")
+
+    def _add(self, run):
+        run_id = run.get("runId")
+        if not run_id:
+            return
+        self.runs[run_id] = run
+        entry = (run.get("createdAt") or "", run_id)
+        branch = self._branch(run)
+        keys = {(branch, None), (None, None)}
+        for tag in run.get("tags") or []:
+            keys.add((branch, tag))
+            keys.add((None, tag))
+        for key in keys:
+            bisect.insort(self.postings.setdefault(key, []), entry)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable run index {self.path}: {e}", file=sys.stderr)
+            return
+        for run in saved.get("runs", []):
+            self._add(run)
+        self.oldest_cursor = saved.get("oldest_cursor")
+        self.complete = saved.get("complete", False)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"runs": list(self.runs.values()), "oldest_cursor": self.oldest_cursor, "complete": self.complete},
+                f,
+                default=str,
+            )
+        os.replace(tmp_path, self.path)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_run_index(project_id=None):
+    """Return the shared run index for a project, loading it from disk on first use."""
+    project_id = project_id or get_client().project_id
+    with _indexes_lock:
+        if project_id not in _indexes:
+            cache_dir = os.getenv("CURRENTS_CACHE_DIR", ".cache")
+            _indexes[project_id] = RunIndex(os.path.join(cache_dir, f"run_index_{project_id}.json"))
+        return _indexes[project_id]
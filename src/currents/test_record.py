@@ -0,0 +1,110 @@
+import json
+import sys
+import zlib
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+def dump_json_bytes(value, default=None):
+    if orjson is not None:
+        return orjson.dumps(value, default=default)
+    return json.dumps(value, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def load_json_bytes(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def intern_str(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class TestRecord:
+    """
+    Compact, slotted stand-in for the per-test result dict.
+
+    `spec`, `groupId`, `status` and title segments are interned, so the thousands
+    of tests that share a spec or group point at one string. `attempts` (errors, stacks,
+    artifacts) is kept as compressed JSON bytes and only parsed when someone reads
+    it, which in practice means tests that end up in a reported category.
+
+    Records still behave like the old dicts (`record["name"]`, `record.get(...)`,
+    `record["history"] = ...`), and `to_dict()` returns the plain dict.
+    """
+
+    __slots__ = ("name", "title", "testId", "status", "groupId", "spec", "_attempts_raw", "_attempts", "_extra")
+
+    FIELDS = ("name", "title", "testId", "status", "groupId", "spec", "attempts")
+
+    def __init__(self, name, title, testId, status, groupId, spec, attempts=None):
+        self.name = name
+        # Title segments (feature / describe names) repeat across tests, so intern those too
+        self.title = tuple(intern_str(part) for part in title) if isinstance(title, list) else title
+        self.testId = testId
+        self.status = intern_str(status)
+        self.groupId = intern_str(groupId)
+        self.spec = intern_str(spec)
+        # Stacks and error text compress well even at the fastest zlib level
+        self._attempts_raw = zlib.compress(dump_json_bytes(attempts), 1) if attempts is not None else None
+        self._attempts = None
+        self._extra = None
+
+    @property
+    def attempts(self):
+        if self._attempts is None and self._attempts_raw is not None:
+            self._attempts = load_json_bytes(zlib.decompress(self._attempts_raw))
+        return self._attempts
+
+    def __getitem__(self, key):
+        if key == "title" and isinstance(self.title, tuple):
+            return list(self.title)
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS and key != "attempts":
+            setattr(self, key, value)
+        elif key == "attempts":
+            self._attempts_raw = None
+            self._attempts = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELDS or (self._extra is not None and key in self._extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.FIELDS) + list(self._extra or {})
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"TestRecord({self.groupId!r}, {self.name!r}, {self.status!r})"
+
+
+def to_plain(value):
+    """Recursively turn TestRecords inside lists/dicts back into plain dicts (for JSON output)."""
+    if isinstance(value, TestRecord):
+        return {key: to_plain(item) for key, item in value.to_dict().items()}
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
@@ -0,0 +1,124 @@
+import numpy as np
+
+MISSING, PASSED, FAILED = 0, 1, 2
+STATUS_CODES = {"passed": PASSED, "failed": FAILED}
+# Share of observed run-to-run flips above which a test counts as flaky
+FLAKY_RATE = 0.3
+
+
+class FlakinessMatrix:
+    """
+    Test × run status matrix over the last N runs, oldest run first.
+
+    Tests are rows keyed by `(groupId, testId)`, runs are columns, and each cell
+    holds MISSING, PASSED or FAILED (skipped and pending results count as missing).
+    Cells are collected as instances stream in; `build()` then computes every
+    per-test statistic for all rows at once with NumPy.
+    """
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.rows = {}
+        self._cells = ([], [], [])
+        self.status = None
+
+    def add_tests(self, column, tests):
+        """Record the results of one downloaded instance of the run in `column`."""
+        rows, columns, codes = self._cells
+        for test in tests:
+            code = STATUS_CODES.get(test.get("status"))
+            if code is None:
+                continue
+            key = (test.get("groupId"), test.get("testId"))
+            rows.append(self.rows.setdefault(key, len(self.rows)))
+            columns.append(column)
+            codes.append(code)
+
+    def build(self):
+        rows, columns, codes = self._cells
+        n_runs = len(self.runs)
+        self.status = np.zeros((len(self.rows), n_runs), dtype=np.int8)
+        self.status[np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)] = np.asarray(codes, dtype=np.int8)
+        self._cells = ([], [], [])
+
+        passed = self.status == PASSED
+        failed = self.status == FAILED
+        observed = passed | failed
+        column_index = np.arange(n_runs)
+
+        self.runs_observed = observed.sum(axis=1)
+        self.failure_rate = failed.sum(axis=1) / np.maximum(self.runs_observed, 1)
+
+        # Carry the last observed status forward over missing cells, then count flips
+        last_seen = np.maximum.accumulate(np.where(observed, column_index, 0), axis=1)
+        filled = np.take_along_axis(self.status, last_seen, axis=1)
+        flips = (filled[:, 1:] != filled[:, :-1]) & observed[:, 1:] & (filled[:, :-1] != MISSING)
+        self.transitions = flips.sum(axis=1)
+        self.flake_rate = self.transitions / np.maximum(self.runs_observed - 1, 1)
+
+        # Current streak: failures after the newest pass, missing runs skipped
+        any_pass = passed.any(axis=1)
+        self.last_pass = np.where(any_pass, n_runs - 1 - np.argmax(passed[:, ::-1], axis=1), -1)
+        since_last_pass = column_index[None, :] > self.last_pass[:, None]
+        streak_cells = failed & since_last_pass
+        self.failure_streak = streak_cells.sum(axis=1)
+        self.first_failing = np.where(streak_cells.any(axis=1), np.argmax(streak_cells, axis=1), -1)
+        return self
+
+    def history(self, test):
+        """
+        The test's current failure streak in the shape `summarize_test_history` returns,
+        or None when the matrix can't tell (the test never passed within the window).
+        """
+        row = self.rows.get((test.get("groupId"), test.get("testId")))
+        if row is None or self.last_pass[row] < 0:
+            return None
+
+        last_pass_run = self.runs[self.last_pass[row]]
+        first_failing_run = self.runs[self.first_failing[row]] if self.first_failing[row] >= 0 else {}
+        latest_commit = (self.runs[-1].get("meta") or {}).get("commit", {})
+        return {
+            "raw_history": [],
+            "latest_author": latest_commit.get("authorName"),
+            "lastPassCommitSHA": (last_pass_run.get("meta") or {}).get("commit", {}).get("sha"),
+            "lastPassDate": last_pass_run.get("createdAt"),
+            "consecutiveFailures": int(self.failure_streak[row]),
+            "firstFailingRunId": first_failing_run.get("runId"),
+            "flakeRate": round(float(self.flake_rate[row]), 3),
+            "transitions": int(self.transitions[row]),
+        }
+
+    def summary(self):
+        """Per-test statistics for every row, flakiest first."""
+        tests = [
+            {
+                "groupId": group_id,
+                "testId": test_id,
+                "runsObserved": int(self.runs_observed[row]),
+                "failureRate": round(float(self.failure_rate[row]), 3),
+                "flakeRate": round(float(self.flake_rate[row]), 3),
+                "transitions": int(self.transitions[row]),
+                "failureStreak": int(self.failure_streak[row]),
+                "firstFailingRunId": self.runs[self.first_failing[row]].get("runId") if self.first_failing[row] >= 0 else None,
+            }
+            for (group_id, test_id), row in self.rows.items()
+        ]
+        tests.sort(key=lambda test: (-test["flakeRate"], -test["failureRate"]))
+        return {"runs": [run.get("runId") for run in self.runs], "tests": tests}
+
+    def flaky_count(self):
+        return int(((self.flake_rate >= FLAKY_RATE) & (self.runs_observed > 2)).sum())
+
+
+def build_flakiness_matrix(runs, tests_per_run):
+    """
+    Build the matrix from already downloaded results.
+
+    Args:
+        runs (list): Run details, oldest first.
+        tests_per_run (list): One list of tests per run, in the same order.
+    """
+    matrix = FlakinessMatrix(runs)
+    for column, tests in enumerate(tests_per_run):
+        matrix.add_tests(column, tests)
+    return matrix.build()
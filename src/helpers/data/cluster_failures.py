@@ -0,0 +1,139 @@
+import os
+import re
+import random
+import zlib
+from collections import Counter, defaultdict
+from helpers.llm.serialize_test_run_diff import error_summary
+
+# Estimated Jaccard similarity above which two error messages share a cluster
+SIMILARITY_THRESHOLD = float(os.getenv("CLUSTER_SIMILARITY", "0.6"))
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_PRIME = (1 << 61) - 1
+
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Order matters: timestamps and ids before the bare numbers they contain
+NORMALIZATIONS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(\.\d+)?\b"), "<ts>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<id>"),
+    (re.compile(r"\b[0-9a-f]{12,}\b", re.IGNORECASE), "<id>"),
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"(?:[A-Za-z]:)?(?:[\\/][\w.@-]+){2,}(?::\d+)*"), "<path>"),
+    (re.compile(r"\d+"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_error(message):
+    """Strip the parts of an error that differ between otherwise identical failures."""
+    for pattern, replacement in NORMALIZATIONS:
+        message = pattern.sub(replacement, message)
+    return message.strip().lower()
+
+
+def minhash(text):
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature_a, signature_b):
+    return sum(x == y for x, y in zip(signature_a, signature_b)) / NUM_PERMUTATIONS
+
+
+def cluster_failures(tests):
+    """
+    Group failing tests by the similarity of their error messages.
+
+    Messages are normalized (timestamps, ids, paths, urls and numbers replaced by
+    placeholders) and identical ones collapse first. The distinct messages are then
+    compared with MinHash signatures, using LSH banding so only likely matches are
+    compared, and merged when their estimated similarity passes `CLUSTER_SIMILARITY`.
+
+    Args:
+        tests (list): Failing tests, each with `attempts`, `spec` and `groupId`.
+
+    Returns:
+        list: Clusters, largest first. Each is a dict with `representative` (the first
+        original message), `pattern` (its normalized form), `count`, `tests`, and
+        `specs` / `groups` counters.
+    """
+    tests_by_pattern = defaultdict(list)
+    messages = {}
+    for test in tests:
+        message = error_summary(test)
+        if not message:
+            continue
+        pattern = normalize_error(message)
+        tests_by_pattern[pattern].append(test)
+        messages.setdefault(pattern, message)
+
+    patterns = list(tests_by_pattern)
+    signatures = [minhash(pattern) for pattern in patterns]
+
+    parent = list(range(len(patterns)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = defaultdict(list)
+    for i, signature in enumerate(signatures):
+        for band in range(BANDS):
+            buckets[(band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))].append(i)
+
+    for members in buckets.values():
+        first = members[0]
+        for other in members[1:]:
+            root_a, root_b = find(first), find(other)
+            if root_a != root_b and similarity(signatures[first], signatures[other]) >= SIMILARITY_THRESHOLD:
+                parent[root_b] = root_a
+
+    grouped = defaultdict(list)
+    for i in range(len(patterns)):
+        grouped[find(i)].append(i)
+
+    clusters = []
+    for members in grouped.values():
+        # The most common message in the cluster stands for the rest
+        members.sort(key=lambda i: len(tests_by_pattern[patterns[i]]), reverse=True)
+        cluster_tests = [test for i in members for test in tests_by_pattern[patterns[i]]]
+        clusters.append({
+            "representative": messages[patterns[members[0]]],
+            "pattern": patterns[members[0]],
+            "count": len(cluster_tests),
+            "tests": cluster_tests,
+            "specs": Counter(test.get("spec") for test in cluster_tests),
+            "groups": Counter(test.get("groupId") for test in cluster_tests),
+        })
+
+    clusters.sort(key=lambda cluster: (-cluster["count"], cluster["pattern"]))
+    return clusters
+
+
+def render_patterns(clusters, limit=5):
+    """
+    Render the Patterns section from clusters that repeat, or None when every
+    failure is different.
+    """
+    lines = []
+    for cluster in clusters[:limit]:
+        if cluster["count"] < 2:
+            break
+        groups = ", ".join(f"{group} ×{count}" for group, count in cluster["groups"].most_common(3))
+        specs = cluster["specs"].most_common()
+        where = f"{len(specs)} specs" if len(specs) > 1 else specs[0][0]
+        representative = cluster["representative"]
+        if len(representative) > 80:
+            representative = representative[:80] + "..."
+        lines.append(f"• {cluster['count']} failures share “{representative}” ({where}; {groups})")
+    if not lines:
+        return None
+    return "\n".join(["🔍 Patterns"] + lines)
@@ -5,7 +5,7 @@ TestResult = Dict[str, str]  # Expecting {'testId': str, 'status': 'PASSED' | 'F
 def compare_test_results(
     previous: List[TestResult], current: List[TestResult]
 ) -> Dict[str, List[TestResult]]:
-    previous_map = {test['testId']: test for test in previous}
+    previous_map = {(test.get('groupId'), test['testId']): test for test in previous}
     result = {
         "Resolved": [],
         "Still Failing": [],
@@ -14,8 +14,7 @@ def compare_test_results(
     }
 
     for current_test in current:
-        test_id = current_test['testId']
-        prev_test = previous_map.get(test_id)
+        prev_test = previous_map.get((current_test.get('groupId'), current_test['testId']))
 
         if not prev_test:
             result["New Tests"].append(current_test)
@@ -1,22 +1,88 @@
-
-from currents.get_test_history import get_test_history
+import threading
+import time
+from currents.get_test_history import parse_run_timestamp, get_test_signature, iter_history_pages, summarize_test_history, SharedHistory
+from currents.http_engine import submit_to_pool
+from helpers.data.test_warehouse import get_test_warehouse
 from helpers.tools.write_debug_file import write_debug_file
 
+
+class TestHistoryEnricher:
+    """
+    Attaches history to "Still Failing" tests with as few API calls as possible.
+
+    The same test usually fails in several groups, so signature lookups are
+    de-duplicated by (spec, title) and each signature's history is shared by all
+    of its groups. History pages are pulled lazily: a group stops paging at its
+    most recent pass, and a page is fetched once no matter how many groups read it.
+    Work runs on the shared HTTP pool; the per-group split happens locally.
+    """
+
+    def __init__(self, run_timestamp, debug_mode=False):
+        self.run_timestamp = parse_run_timestamp(run_timestamp)
+        self.debug_mode = debug_mode
+        self.warehouse = get_test_warehouse()
+        self.started_at = time.perf_counter()
+        self._lookups = {}  # (spec, title) -> Future[SharedHistory]
+        self._histories = {}  # signature -> SharedHistory
+        self._submitted = []
+        self._lock = threading.Lock()
+
+    def submit(self, test):
+        """Queue a test for enrichment. Returns immediately; call `finish()` to attach the results."""
+        key = (test.get("spec"), test.get("name"))
+        with self._lock:
+            if key not in self._lookups:
+                self._lookups[key] = submit_to_pool(self._lookup, *key)
+            lookup = self._lookups[key]
+        # Lookups are queued ahead of the summaries that wait on them, so this can't deadlock the pool
+        self._submitted.append((test, submit_to_pool(self._summarize, lookup, test.get("groupId"))))
+
+    def finish(self):
+        """
+        Wait for all queued lookups and set `test["history"]` on every submitted test.
+        The raw history records are also queued for the test warehouse.
+        """
+        for test, summary in self._submitted:
+            group_id = test.get("groupId")
+            try:
+                test_history = summary.result()
+            except Exception as e:
+                test_history = {"raw_history": [], "error": str(e)}
+            test["history"] = test_history
+            if self.warehouse and test_history.get("raw_history"):
+                self.warehouse.record_history(test.get("spec"), test.get("name"), group_id, test_history["raw_history"])
+
+            if self.debug_mode:
+                safe_test_name = test.get("name").replace("/", "_").replace(">", "_").replace(" ", "_")
+                write_debug_file(f"test_history_{group_id}_{safe_test_name}.json", test_history)
+
+        elapsed = time.perf_counter() - self.started_at
+        pages = sum(history.pages_fetched for history in self._histories.values())
+        print(f"    ↪ enriched {len(self._submitted)} tests ({len(self._histories)} histories, {pages} pages) in {elapsed:.2f}s")
+
+    def _lookup(self, spec, title):
+        try:
+            signature = get_test_signature(spec, title)
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch signature: {e}") from e
+
+        with self._lock:
+            if signature not in self._histories:
+                self._histories[signature] = SharedHistory(iter_history_pages(signature, self.run_timestamp))
+            return self._histories[signature]
+
+    def _summarize(self, lookup, group_id):
+        return summarize_test_history(lookup.result(), group_id)
+
+
 def enrich_test_data(test_run_diff, current_run_details, debug_mode=False):
     still_failing = test_run_diff.get("Still Failing", [])
-    if still_failing:
+    run_timestamp = current_run_details.get("createdAt")
+    if still_failing and run_timestamp:
+        enricher = TestHistoryEnricher(run_timestamp, debug_mode)
         for test in still_failing:
-            group_id = test.get("groupId")
-            test_name = test.get("name")
-            spec = test.get("spec")
-            run_timestamp = current_run_details.get("createdAt")
-            
-            if test_name and spec and run_timestamp:
-                test_history = get_test_history(spec, test_name, run_timestamp, group_id)
-                test["history"] = test_history
-                
-                if debug_mode:
-                    safe_test_name = test_name.replace("/", "_").replace(">", "_").replace(" ", "_")
-                    write_debug_file(f"test_history_{group_id}_{safe_test_name}.json", test_history)
-    
-    return test_run_diff
\ No newline at end of file
+            if test.get("name") and test.get("spec"):
+                enricher.submit(test)
+        enricher.finish()
+
+    return test_run_diff
@@ -1,14 +1,166 @@
+import asyncio
+import threading
 from helpers.tools.write_debug_file import write_debug_file
-from currents.get_test_results_for_run import get_test_results_for_run
+from helpers.data.stream_compare_test_results import IncrementalComparer
+from helpers.data.enrich_test_data import TestHistoryEnricher
+from helpers.data.build_flakiness_matrix import FlakinessMatrix
+from currents.get_project_runs import get_previous_runs
+from currents.get_test_results_for_run import get_test_results_for_runs, stream_test_results_for_runs_async
 
-def get_run_test_results(current_run_id, previous_run_id, debug_mode=False):
+def get_run_test_results(current_run_id, previous_run_id, debug_mode=False, changed_only=False):
     print("🧪 Get test results...")
-    current_run_tests = get_test_results_for_run(current_run_id)
-    previous_run_tests = get_test_results_for_run(previous_run_id)
-    
+    current_run_tests, previous_run_tests = get_test_results_for_runs([current_run_id, previous_run_id], changed_only)
+
     if debug_mode:
         write_debug_file("current_run_tests.json", current_run_tests)
         write_debug_file("previous_run_tests.json", previous_run_tests)
-    
+
     return current_run_tests, previous_run_tests
 
+
+class RunDiffPipeline:
+    """
+    The streaming compare-and-enrich pipeline behind `get_run_test_diff`.
+
+    Runs are fed in with `fetch`, indexed 0 (current), 1 (previous) and 2+ (older
+    runs for the flakiness matrix, newest first). Each `fetch` can be called from
+    its own thread, so the current run can start downloading before the previous
+    run has been resolved.
+    """
+
+    def __init__(self, current_run_details, debug_mode=False, matrix=None):
+        print("🧪 Get test results...")
+        self.debug_mode = debug_mode
+        self.matrix = matrix
+        self.enricher = None
+        if current_run_details.get("createdAt"):
+            self.enricher = TestHistoryEnricher(current_run_details.get("createdAt"), debug_mode)
+        self.comparer = IncrementalComparer(self._on_classified)
+        self.debug_tests = ([], [])
+        self.missing_instances = {}  # run index -> ids of instances that couldn't be downloaded
+        self.skipped_instances = 0  # instances changed-only mode didn't download
+        self._lock = threading.Lock()
+
+    def fetch(self, run_ids, first_index=0, changed_only=False):
+        """Download `run_ids` into the pipeline; the first one gets index `first_index`."""
+        asyncio.run(stream_test_results_for_runs_async(
+            run_ids,
+            lambda run_index, tests: self._on_tests(first_index + run_index, tests),
+            lambda run_index: self._on_run_complete(first_index + run_index),
+            changed_only,
+            lambda run_index, instance_id, error: self._on_instance_error(first_index + run_index, instance_id),
+            self._on_plan,
+        ))
+
+    def finish(self):
+        """Wait for enrichment and return the diff."""
+        with self._lock:
+            test_run_diff = self.comparer.finish()
+
+        if self.comparer.first_result_after is not None:
+            print(f"    ↪ first result after {self.comparer.first_result_after:.2f}s, peak {self.comparer.peak_pending} tests held")
+        missing = self.missing_counts()
+        if missing:
+            print("    ↪ ⚠️ partial data, instances not downloaded: " + ", ".join(f"{count} of the {run} run" for run, count in missing.items()))
+
+        matrix = self.matrix
+        if matrix:
+            matrix.build()
+            from_matrix = 0
+            for test in test_run_diff["Still Failing"]:
+                history = matrix.history(test)
+                if history:
+                    test["history"] = history
+                    from_matrix += 1
+                elif self.enricher and test.get("name") and test.get("spec"):
+                    self.enricher.submit(test)
+            print(f"    ↪ flakiness matrix: {len(matrix.rows)} tests × {len(matrix.runs)} runs, {matrix.flaky_count()} flaky, {from_matrix} streaks resolved locally")
+            if self.debug_mode:
+                write_debug_file("flakiness_matrix.json", matrix.summary())
+
+        if self.enricher:
+            self.enricher.finish()
+
+        if self.debug_mode:
+            write_debug_file("current_run_tests.json", self.debug_tests[0])
+            write_debug_file("previous_run_tests.json", self.debug_tests[1])
+
+        return test_run_diff
+
+    def missing_counts(self):
+        """`{"current": n, "previous": n, "older": n}` for the runs with instances that couldn't be downloaded."""
+        counts = {}
+        with self._lock:
+            for run_index, instance_ids in sorted(self.missing_instances.items()):
+                run = ("current", "previous")[run_index] if run_index < 2 else "older"
+                counts[run] = counts.get(run, 0) + len(instance_ids)
+        return counts
+
+    def _on_classified(self, category, test):
+        if category == "Still Failing" and self.enricher and not self.matrix and test.get("name") and test.get("spec"):
+            self.enricher.submit(test)
+
+    def _on_tests(self, run_index, tests):
+        with self._lock:
+            if run_index == 0:
+                self.comparer.add_current(tests)
+            elif run_index == 1:
+                self.comparer.add_previous(tests)
+            if self.matrix:
+                self.matrix.add_tests(len(self.matrix.runs) - 1 - run_index, tests)
+            if self.debug_mode and run_index < 2:
+                self.debug_tests[run_index].extend(tests)
+
+    def _on_plan(self, plan):
+        with self._lock:
+            self.skipped_instances += plan["skipped"]
+
+    def _on_instance_error(self, run_index, instance_id):
+        with self._lock:
+            self.missing_instances.setdefault(run_index, []).append(instance_id)
+
+    def _on_run_complete(self, run_index):
+        if run_index == 1:
+            with self._lock:
+                self.comparer.complete_previous()
+
+
+def prepare_run_test_diff(current_run_id, previous_run_id, current_run_details, debug_mode=False, matrix_runs=0):
+    """
+    Set up the pipeline for `get_run_test_diff`, resolving the older runs of
+    the flakiness matrix when `matrix_runs` > 2.
+
+    Returns:
+        tuple: (RunDiffPipeline, run ids to `fetch` into it, current run first).
+    """
+    older_runs = []
+    matrix = None
+    if matrix_runs > 2:
+        runs = get_previous_runs(current_run_id, matrix_runs - 1)
+        previous_run = next((run for run in runs if run.get("runId") == previous_run_id), {"runId": previous_run_id})
+        older_runs = [run for run in runs if run.get("runId") != previous_run_id]
+        # Columns run oldest to newest; streams are indexed current, previous, then older runs newest first
+        matrix = FlakinessMatrix(list(reversed(older_runs)) + [previous_run, current_run_details])
+    run_ids = [current_run_id, previous_run_id] + [run.get("runId") for run in older_runs]
+    return RunDiffPipeline(current_run_details, debug_mode, matrix), run_ids
+
+
+def get_run_test_diff(current_run_id, previous_run_id, current_run_details, debug_mode=False, changed_only=False, matrix_runs=0):
+    """
+    Download both runs, compare and enrich them as one streaming pipeline.
+
+    Instances flow into an `IncrementalComparer` as they arrive, and "Still Failing"
+    tests are handed to history enrichment the moment they are classified, so the
+    history crawl overlaps with the remaining downloads.
+
+    With `matrix_runs` > 2, that many of the latest runs (current and previous
+    included) are downloaded side by side into a `FlakinessMatrix`, and "Still
+    Failing" streaks come from it. Only tests that never passed within those runs
+    fall back to the per-test history crawl.
+
+    Returns:
+        dict: The enriched diff, in the same shape as `compare_test_results`.
+    """
+    pipeline, run_ids = prepare_run_test_diff(current_run_id, previous_run_id, current_run_details, debug_mode, matrix_runs)
+    pipeline.fetch(run_ids, changed_only=changed_only)
+    return pipeline.finish()
@@ -0,0 +1,88 @@
+import re
+from helpers.data.cluster_failures import cluster_failures, render_patterns
+from helpers.llm.serialize_test_run_diff import error_summary, truncate_title
+
+ERROR_CONTEXT_CHARS = 35
+# Prefixes that add nothing to a 35 character summary: an error class ("Error: ", not
+# "ErrorBoundary"), then `expect(received).` (the matcher name is kept) or a test timeout
+ERROR_PREFIXES = re.compile(
+    r"^(?:(?:Error|TimeoutError|AssertionError)\b:\s*)?(?:expect\(received\)\.|Test timeout of \d+ms exceeded\.?\s*)?"
+)
+
+
+def short_error(test):
+    error = error_summary(test)
+    if not error:
+        return None
+    error = ERROR_PREFIXES.sub("", error).strip() or error
+    return truncate_title(error, ERROR_CONTEXT_CHARS - 3) if len(error) > ERROR_CONTEXT_CHARS else error
+
+
+def render_test_run_diff(test_run_diff, current_run_details, patterns=True):
+    """
+    Render the report locally, in the same format and with the same truncation
+    rules the LLM prompt asks for. Patterns comes from clustering the New Failures'
+    errors (4+ failures only); pass `patterns=False` to leave it out.
+    Empty sections are left out.
+    """
+    author = (current_run_details.get("meta") or {}).get("commit", {}).get("authorName")
+    sections = []
+
+    new_failures = test_run_diff.get("New Failures", [])
+    if patterns and len(new_failures) >= 4:
+        patterns_section = render_patterns(cluster_failures(new_failures))
+        if patterns_section:
+            sections.append(patterns_section)
+
+    if new_failures:
+        lines = [f"🔴 New Failures ({len(new_failures)}):"]
+        for test in new_failures:
+            line = f"[{test.get('groupId')}] {truncate_title(test.get('name'), 50)}"
+            error = short_error(test)
+            lines.append(f"{line} — {error}" if error else line)
+        sections.append("\n".join(lines))
+
+    still_failing = test_run_diff.get("Still Failing", [])
+    if still_failing:
+        lines = [f"🫠 Still Failing ({len(still_failing)}):"]
+        for test in still_failing:
+            history = test.get("history") or {}
+            sha = (history.get("lastPassCommitSHA") or "")[:7]
+            streak = f"{history.get('consecutiveFailures', 1)}x since {sha}" if sha else f"{history.get('consecutiveFailures', 1)}x"
+            lines.append(f"[{test.get('groupId')}] {truncate_title(test.get('name'), 50)} ({streak})")
+        sections.append("\n".join(lines))
+
+    new_tests = test_run_diff.get("New Tests", [])
+    if new_tests:
+        lines = [f"⭐️ New Tests ({len(new_tests)}):"]
+        for test in new_tests:
+            added_by = f" (added by {author})" if author else ""
+            lines.append(f"[{test.get('groupId')}] {truncate_title(test.get('name'), 50)}{added_by}")
+        sections.append("\n".join(lines))
+
+    resolved = test_run_diff.get("Resolved", [])
+    if resolved:
+        lines = [f"✅ Resolved ({len(resolved)}):"]
+        for test in resolved:
+            lines.append(f"[{test.get('groupId')}] {truncate_title(test.get('name'), 90, ellipsis=False)}")
+        sections.append("\n".join(lines))
+
+    return "\n\n".join(sections)
+
+
+def render_partial_notice(missing_counts, skipped_instances=0):
+    """
+    Notes for a report built from less than every instance, given
+    `RunDiffPipeline.missing_counts()` and `RunDiffPipeline.skipped_instances`:
+    a warning for failed downloads, and a line for instances changed-only mode
+    skipped on purpose. Empty when everything was downloaded.
+    """
+    lines = []
+    if missing_counts:
+        runs = ", ".join(f"{count} instance{'s' if count != 1 else ''} of the {run} run" for run, count in missing_counts.items())
+        lines.append(f"⚠️ Partial data: {runs} could not be downloaded. "
+                     "Tests in those specs are missing from this report or may be misclassified.")
+    if skipped_instances:
+        lines.append(f"ℹ️ Changed-only: {skipped_instances} instance{'s' if skipped_instances != 1 else ''} skipped, "
+                     "from specs that passed in both runs with the same number of tests.")
+    return "\n".join(lines)
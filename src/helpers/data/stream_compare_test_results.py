@@ -0,0 +1,80 @@
+import time
+
+CATEGORIES = ("Resolved", "Still Failing", "New Failures", "New Tests")
+
+
+class IncrementalComparer:
+    """
+    Classifies tests while instances of both runs are still downloading.
+
+    Tests are matched on (groupId, testId). A test is classified as soon as both
+    sides of it have arrived; only unmatched current tests and the statuses of
+    unmatched previous tests are held in memory. New Tests can only be decided
+    once the previous run is complete, so those are released at that point.
+
+    Args:
+        on_classified (callable, optional): Called as `on_classified(category, test)`
+            the moment a test lands in a category.
+    """
+
+    def __init__(self, on_classified=None):
+        self.on_classified = on_classified
+        self.result = {category: [] for category in CATEGORIES}
+        self.previous_complete = False
+        self.started_at = time.perf_counter()
+        self.first_result_after = None
+        self.peak_pending = 0
+        self._pending_count = 0
+        self._previous_status = {}  # (groupId, testId) -> status
+        self._pending_current = {}  # (groupId, testId) -> [tests waiting for the previous run]
+
+    def add_current(self, tests):
+        for test in tests:
+            key = (test.get("groupId"), test.get("testId"))
+            if key in self._previous_status:
+                self._classify(self._previous_status[key], test)
+            elif self.previous_complete:
+                self._emit("New Tests", test)
+            else:
+                self._pending_current.setdefault(key, []).append(test)
+                self._pending_count += 1
+        self.peak_pending = max(self.peak_pending, self._pending_count)
+
+    def add_previous(self, tests):
+        for test in tests:
+            key = (test.get("groupId"), test.get("testId"))
+            self._previous_status[key] = test.get("status")
+            for current_test in self._pending_current.pop(key, []):
+                self._pending_count -= 1
+                self._classify(test.get("status"), current_test)
+
+    def complete_previous(self):
+        """Mark the previous run as fully downloaded; anything still unmatched is a new test."""
+        self.previous_complete = True
+        for tests in self._pending_current.values():
+            for test in tests:
+                self._emit("New Tests", test)
+        self._pending_current = {}
+        self._pending_count = 0
+
+    def finish(self):
+        """Return the diff in the same shape as `compare_test_results`."""
+        if not self.previous_complete:
+            self.complete_previous()
+        return self.result
+
+    def _classify(self, previous_status, current_test):
+        if previous_status == 'failed' and current_test['status'] == 'failed':
+            self._emit("Still Failing", current_test)
+        elif previous_status == 'failed' and current_test['status'] == 'passed':
+            self._emit("Resolved", current_test)
+        elif previous_status == 'passed' and current_test['status'] == 'failed':
+            self._emit("New Failures", current_test)
+
+    def _emit(self, category, test):
+        if self.first_result_after is None:
+            self.first_result_after = time.perf_counter() - self.started_at
+        self.result[category].append(test)
+        if self.on_classified:
+            self.on_classified(category, test)
+
@@ -0,0 +1,442 @@
+import atexit
+import contextvars
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+from currents.client import get_client
+from currents.get_run_details import get_run_details
+
+# Every string column is dictionary-encoded: rows hold small integer ids, and each
+# distinct spec, group, test name, status, sha or error message is stored once.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionary (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS runs (
+    run INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    branch INTEGER,
+    sha INTEGER,
+    author INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    run INTEGER NOT NULL,
+    grp INTEGER NOT NULL,
+    spec INTEGER NOT NULL,
+    name INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    error INTEGER,
+    PRIMARY KEY (run, grp, spec, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (
+    spec INTEGER NOT NULL,
+    name INTEGER NOT NULL,
+    grp INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    branch INTEGER,
+    sha INTEGER,
+    author INTEGER,
+    PRIMARY KEY (spec, name, grp, created_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_test ON results (spec, name);
+"""
+
+# Result columns a query can group by
+GROUP_BY = {"spec": ("spec",), "group": ("grp",), "test": ("spec", "name")}
+
+
+def first_error_line(attempts):
+    for attempt in reversed(attempts or []):
+        message = ((attempt or {}).get("error") or {}).get("message")
+        if message:
+            return message.strip().split("\n", 1)[0][:300]
+    return None
+
+
+def resolve_window(since, until, days):
+    """
+    `(since, until)` ISO timestamps for a query: `until` defaults to now, and
+    `since` to `days` days before `until`.
+    """
+    until = until or datetime.utcnow().isoformat() + "Z"
+    if not since:
+        end = datetime.fromisoformat(until.replace("Z", ""))
+        since = (end - timedelta(days=days)).isoformat() + "Z"
+    return since, until
+
+
+class Partition:
+    """One project's results and history for one run date, in its own SQLite file."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.ids = dict(self.conn.execute("SELECT value, id FROM dictionary"))
+        self.dirty = False
+
+    def encode(self, value):
+        if value is None:
+            return None
+        value = str(value)
+        id_ = self.ids.get(value)
+        if id_ is None:
+            id_ = self.conn.execute("INSERT INTO dictionary (value) VALUES (?)", (value,)).lastrowid
+            self.ids[value] = id_
+        return id_
+
+
+class TestWarehouse:
+    """
+    Append-only local store of every downloaded test result and history record,
+    so trend questions don't need another crawl of the Currents API.
+
+    Data is partitioned by project and run date (`<root>/<projectId>/<YYYY-MM-DD>.sqlite`),
+    so a query over a window only opens the days it covers. Writes are queued and
+    applied on a background thread, in the client context of the caller; records
+    already stored (same run, group, spec and test) are left as they are.
+
+    Queries read `results` (runs this tool downloaded). `first_bad_commits` also
+    reads `history`, which reaches further back than the downloaded runs.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.stats = {"results": 0, "history": 0, "errors": 0}
+        self._partitions = {}  # (project, date) -> Partition
+        self._runs = {}  # (project, runId) -> (date, run row)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record_tests(self, run_id, tests):
+        """Queue a run's test results (`TestRecord`s or dicts). The run's date and commit come from its details."""
+        self._put(self._write_tests, run_id, list(tests))
+
+    def record_history(self, spec, name, group_id, records):
+        """Queue a test's raw history records, as returned in `raw_history` by `get_test_history`."""
+        self._put(self._write_history, spec, name, group_id, list(records))
+
+    def flush(self):
+        """Wait until everything queued so far is written and committed."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        for partition in self._partitions.values():
+            partition.conn.close()
+        self._partitions.clear()
+
+    # Queries
+
+    def partitions(self, project_id=None, since=None, until=None):
+        """Paths of the project's partitions whose date falls in `[since, until]`, oldest first."""
+        project_dir = os.path.join(self.root, project_id or get_client().project_id)
+        if not os.path.isdir(project_dir):
+            return []
+        dates = sorted(name[:-len(".sqlite")] for name in os.listdir(project_dir) if name.endswith(".sqlite"))
+        return [
+            os.path.join(project_dir, f"{date}.sqlite")
+            for date in dates
+            if (not since or date >= since[:10]) and (not until or date <= until[:10])
+        ]
+
+    def failure_counts(self, since=None, until=None, by="spec", branch=None, project_id=None, days=7):
+        """
+        Failures per spec, group or test (`by`) over the runs created in `[since, until]`
+        (default: the last `days` days), most failures first.
+
+        Returns:
+            list: `{"key", "failures", "executions", "runs"}` dicts; `runs` counts the runs with a failure.
+        """
+        since, until = resolve_window(since, until, days)
+        totals = {}
+        for path in self.partitions(project_id, since, until):
+            for row in self._query(path, f"""
+                SELECT {self._key_sql(by)}, IFNULL(SUM(r.status = s.id), 0), COUNT(*), COUNT(DISTINCT CASE WHEN r.status = s.id THEN r.run END)
+                FROM results r JOIN runs u ON u.run = r.run {self._key_joins(by)}
+                LEFT JOIN dictionary s ON s.value = 'failed'
+                WHERE u.created_at >= ? AND u.created_at <= ? {self._branch_sql(branch)}
+                GROUP BY {", ".join("r." + column for column in GROUP_BY[by])}
+            """, [since, until] + ([branch] if branch else [])):
+                key = row[:-3] if by == "test" else row[0]
+                failures, executions, runs = totals.get(key, (0, 0, 0))
+                totals[key] = (failures + row[-3], executions + row[-2], runs + row[-1])
+
+        return sorted(
+            ({"key": " › ".join(key) if by == "test" else key, "failures": failures, "executions": executions, "runs": runs}
+             for key, (failures, executions, runs) in totals.items() if failures),
+            key=lambda row: (-row["failures"], row["key"]),
+        )
+
+    def growing_failures(self, since=None, until=None, by="test", branch=None, project_id=None, days=14, limit=20):
+        """
+        Failures whose daily failure rate is trending up over `[since, until]`
+        (default: the last `days` days), steepest trend first. The slope is fitted
+        over the days the key ran, so a test that failed 1 in 10 runs at the start of
+        the window and 3 in 10 at the end has a slope of about +0.2 / window length.
+
+        Returns:
+            list: `{"key", "slope", "firstRate", "lastRate", "failures", "executions", "days"}` dicts,
+            `slope` being the change in failure rate per day.
+        """
+        since, until = resolve_window(since, until, days)
+        daily = {}  # key -> {day: [failures, executions]}
+        for path in self.partitions(project_id, since, until):
+            for row in self._query(path, f"""
+                SELECT {self._key_sql(by)}, substr(u.created_at, 1, 10), IFNULL(SUM(r.status = s.id), 0), COUNT(*)
+                FROM results r JOIN runs u ON u.run = r.run {self._key_joins(by)}
+                LEFT JOIN dictionary s ON s.value = 'failed'
+                WHERE u.created_at >= ? AND u.created_at <= ? {self._branch_sql(branch)}
+                GROUP BY {", ".join("r." + column for column in GROUP_BY[by])}, 2
+            """, [since, until] + ([branch] if branch else [])):
+                key = row[:-3] if by == "test" else row[0]
+                counts = daily.setdefault(key, {}).setdefault(row[-3], [0, 0])
+                counts[0] += row[-2]
+                counts[1] += row[-1]
+
+        growing = []
+        for key, days_counts in daily.items():
+            if len(days_counts) < 2 or not any(failures for failures, _ in days_counts.values()):
+                continue
+            ordered = sorted(days_counts.items())
+            origin = datetime.fromisoformat(ordered[0][0])
+            xs = [(datetime.fromisoformat(day) - origin).days for day, _ in ordered]
+            ys = [failures / executions for _, (failures, executions) in ordered]
+            mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+            if slope > 0:
+                growing.append({
+                    "key": " › ".join(key) if by == "test" else key,
+                    "slope": round(slope, 4),
+                    "firstRate": round(ys[0], 3),
+                    "lastRate": round(ys[-1], 3),
+                    "failures": sum(failures for failures, _ in days_counts.values()),
+                    "executions": sum(executions for _, executions in days_counts.values()),
+                    "days": len(ordered),
+                })
+        growing.sort(key=lambda row: (-row["slope"], row["key"]))
+        return growing[:limit]
+
+    def first_bad_commits(self, spec, name, group_id=None, branch=None, project_id=None):
+        """
+        For each group the test is currently failing in, walk its stored results and
+        history back from the newest record to its last pass. Partitions are read
+        newest first and the walk stops at the first day that contains a pass.
+
+        Returns:
+            list: Per group, `{"groupId", "firstBadCommit", "author", "firstFailedAt", "runId",
+            "lastGoodCommit", "lastPassedAt", "failingRecords"}`. `lastGoodCommit` is None when
+            the warehouse holds no pass for the test, i.e. the streak may start earlier.
+        """
+        walks = {}  # group -> walk state; `done` once the pass is found
+        for path in reversed(self.partitions(project_id)):
+            observations = self._query(path, f"""
+                SELECT * FROM (
+                    SELECT u.created_at, st.value, sha.value, au.value, ru.value, g.value
+                    FROM results r JOIN runs u ON u.run = r.run
+                    JOIN dictionary st ON st.id = r.status JOIN dictionary g ON g.id = r.grp
+                    JOIN dictionary ru ON ru.id = r.run
+                    LEFT JOIN dictionary sha ON sha.id = u.sha LEFT JOIN dictionary au ON au.id = u.author
+                    LEFT JOIN dictionary b ON b.id = u.branch
+                    WHERE r.spec = (SELECT id FROM dictionary WHERE value = ?) AND r.name = (SELECT id FROM dictionary WHERE value = ?)
+                        {"AND b.value = ?" if branch else ""}
+                    UNION ALL
+                    SELECT h.created_at, st.value, sha.value, au.value, NULL, g.value
+                    FROM history h
+                    JOIN dictionary st ON st.id = h.status JOIN dictionary g ON g.id = h.grp
+                    LEFT JOIN dictionary sha ON sha.id = h.sha LEFT JOIN dictionary au ON au.id = h.author
+                    LEFT JOIN dictionary b ON b.id = h.branch
+                    WHERE h.spec = (SELECT id FROM dictionary WHERE value = ?) AND h.name = (SELECT id FROM dictionary WHERE value = ?)
+                        {"AND b.value = ?" if branch else ""}
+                ) ORDER BY 1 DESC
+            """, [spec, name] + ([branch] if branch else []) + [spec, name] + ([branch] if branch else []))
+
+            for created_at, status, sha, author, run_id, group in observations:
+                if (group_id and group != group_id) or status not in ("passed", "failed"):
+                    continue
+                walk = walks.setdefault(group, {"groupId": group, "failing": None, "done": False, "seen": set()})
+                if walk["done"] or (created_at, sha) in walk["seen"]:
+                    continue
+                walk["seen"].add((created_at, sha))
+                if walk["failing"] is None:
+                    # The newest record decides whether the test is failing in this group at all
+                    walk["failing"] = status == "failed"
+                    walk["done"] = not walk["failing"]
+                    walk.update(firstBadCommit=sha, author=author, firstFailedAt=created_at, runId=run_id,
+                                lastGoodCommit=None, lastPassedAt=None, failingRecords=1 if walk["failing"] else 0)
+                elif status == "failed":
+                    walk.update(firstBadCommit=sha, author=author, firstFailedAt=created_at, runId=run_id)
+                    walk["failingRecords"] += 1
+                elif status == "passed":
+                    walk.update(lastGoodCommit=sha, lastPassedAt=created_at, done=True)
+            if walks and all(walk["done"] for walk in walks.values()):
+                break
+
+        return [
+            {key: value for key, value in walk.items() if key not in ("failing", "done", "seen")}
+            for walk in sorted(walks.values(), key=lambda walk: walk["groupId"])
+            if walk["failing"]
+        ]
+
+    # Writing
+
+    def _put(self, write, *args):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warehouse-writer", daemon=True)
+                self._thread.start()
+        # The writer looks runs up through the API, so it needs the caller's client
+        self._queue.put((contextvars.copy_context(), write, args))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    self._commit()
+                    return
+                context, write, args = item
+                context.run(write, *args)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Warning: couldn't write to the test warehouse: {e}", file=sys.stderr)
+            finally:
+                # Commit once the queue drains rather than per instance
+                if item is not None and self._queue.unfinished_tasks <= 1:
+                    self._commit()
+                self._queue.task_done()
+
+    def _commit(self):
+        for partition in self._partitions.values():
+            if partition.dirty:
+                partition.conn.commit()
+                partition.dirty = False
+
+    def _partition(self, project_id, date):
+        key = (project_id, date)
+        if key not in self._partitions:
+            self._partitions[key] = Partition(os.path.join(self.root, project_id, f"{date}.sqlite"))
+        return self._partitions[key]
+
+    def _run_row(self, project_id, run_id):
+        key = (project_id, run_id)
+        if key not in self._runs:
+            run = get_run_details(run_id)
+            if "error" in run or not run.get("createdAt"):
+                raise ValueError(f"no details for run {run_id}: {run.get('error', 'missing createdAt')}")
+            commit = (run.get("meta") or {}).get("commit") or {}
+            self._runs[key] = (run["createdAt"][:10], (run_id, run["createdAt"], commit.get("branch"), commit.get("sha"), commit.get("authorName")))
+        return self._runs[key]
+
+    def _write_tests(self, run_id, tests):
+        project_id = get_client().project_id
+        date, run_row = self._run_row(project_id, run_id)
+        partition = self._partition(project_id, date)
+        encode = partition.encode
+        run = encode(run_id)
+        partition.conn.execute(
+            "INSERT OR IGNORE INTO runs (run, created_at, branch, sha, author) VALUES (?, ?, ?, ?, ?)",
+            (run, run_row[1], encode(run_row[2]), encode(run_row[3]), encode(run_row[4])),
+        )
+        rows = []
+        for test in tests:
+            attempts = test.get("attempts") or []
+            error = first_error_line(attempts) if test.get("status") == "failed" else None
+            rows.append((run, encode(test.get("groupId")), encode(test.get("spec")), encode(test.get("name")),
+                         encode(test.get("status")), len(attempts), encode(error)))
+        cursor = partition.conn.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.stats["results"] += cursor.rowcount
+        partition.dirty = True
+
+    def _write_history(self, spec, name, group_id, records):
+        project_id = get_client().project_id
+        by_date = {}
+        for record in records:
+            created_at = record.get("createdAt")
+            if created_at:
+                by_date.setdefault(created_at[:10], []).append(record)
+
+        for date, day_records in by_date.items():
+            partition = self._partition(project_id, date)
+            encode = partition.encode
+            rows = []
+            for record in day_records:
+                commit = record.get("commit") or {}
+                rows.append((encode(spec), encode(name), encode(record.get("groupId") or group_id), record["createdAt"],
+                             encode(record.get("status")), encode(commit.get("branch")), encode(commit.get("sha")),
+                             encode(commit.get("authorName"))))
+            cursor = partition.conn.executemany("INSERT OR IGNORE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.stats["history"] += cursor.rowcount
+            partition.dirty = True
+
+    # Query helpers
+
+    def _query(self, path, sql, params):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _key_sql(self, by):
+        if by not in GROUP_BY:
+            raise ValueError(f"Unknown grouping {by!r}, expected one of {', '.join(GROUP_BY)}")
+        return ", ".join(f"k_{column}.value" for column in GROUP_BY[by])
+
+    def _key_joins(self, by):
+        return " ".join(f"JOIN dictionary k_{column} ON k_{column}.id = r.{column}" for column in GROUP_BY[by])
+
+    def _branch_sql(self, branch):
+        return "AND u.branch = (SELECT id FROM dictionary WHERE value = ?)" if branch else ""
+
+
+_warehouse = None
+_warehouse_lock = threading.Lock()
+_recording = True
+
+
+def set_warehouse_enabled(enabled):
+    """Turn recording on or off for this process; entry points pass their `--no-warehouse` flag here."""
+    global _recording
+    _recording = enabled
+
+
+def get_test_warehouse(readonly=False):
+    """
+    Return the process-wide test warehouse. For recording, None is returned when
+    it's disabled (`set_warehouse_enabled(False)` or `TEST_WAREHOUSE=off`);
+    `readonly` callers (queries) get it regardless.
+    """
+    global _warehouse
+    disabled = not _recording or os.getenv("TEST_WAREHOUSE", "on").lower() in ("off", "0", "false")
+    if disabled and not readonly:
+        return None
+    with _warehouse_lock:
+        if _warehouse is None:
+            cache_dir = os.getenv("CURRENTS_CACHE_DIR", ".cache")
+            _warehouse = TestWarehouse(os.getenv("TEST_WAREHOUSE_DIR", os.path.join(cache_dir, "warehouse")))
+        return _warehouse
+
+
+def close_test_warehouse():
+    """Write out everything still queued. Returns the warehouse (for stats), or None if it was never used."""
+    with _warehouse_lock:
+        warehouse = _warehouse
+    if warehouse is not None:
+        warehouse.close()
+    return warehouse
+
+
+atexit.register(close_test_warehouse)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sys
+from helpers.llm.analyze_test_results_map_reduce import CHUNK_SIZE
+from helpers.llm.serialize_test_run_diff import DEFAULT_TOKEN_BUDGET, error_summary
+from helpers.tools.disk_cache import DiskCache
+
+MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "7"))
+MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "50"))
+
+_cache = None
+
+
+def get_analysis_cache():
+    """Return the analysis cache, or None when `--no-llm-cache` is passed."""
+    global _cache
+    if "--no-llm-cache" in sys.argv:
+        return None
+    if _cache is None:
+        cache_dir = os.getenv("CURRENTS_CACHE_DIR", ".cache")
+        _cache = DiskCache(os.path.join(cache_dir, "llm_analyses.sqlite"), MAX_MB * 1024 * 1024)
+        _cache.delete_older_than(MAX_AGE_DAYS * 86400)
+    return _cache
+
+
+def normalize_test_run_diff(test_run_diff, current_run_details):
+    """
+    Reduce a diff to what the analysis depends on, in a stable order. Tests arrive
+    in download order, so each section is sorted before hashing.
+    """
+    normalized = {}
+    for section, tests in test_run_diff.items():
+        entries = []
+        for test in tests:
+            history = test.get("history") or {}
+            entries.append([
+                test.get("groupId"),
+                test.get("name"),
+                test.get("status"),
+                error_summary(test) if section == "New Failures" else None,
+                history.get("consecutiveFailures"),
+                history.get("lastPassCommitSHA"),
+            ])
+        normalized[section] = sorted(entries, key=lambda entry: json.dumps(entry, default=str))
+    normalized["author"] = (current_run_details.get("meta") or {}).get("commit", {}).get("authorName")
+    return normalized
+
+
+def analysis_cache_key(test_run_diff, current_run_details, prompt_version, models):
+    identity = json.dumps(
+        {
+            "diff": normalize_test_run_diff(test_run_diff, current_run_details),
+            "prompt_version": prompt_version,
+            "models": models,
+            # Both change what the model is sent, so a change must not hit an old analysis
+            "token_budget": DEFAULT_TOKEN_BUDGET,
+            "chunk_size": CHUNK_SIZE,
+            # Read when the key is built, like the OpenAI client does, so a local stub's replies stay apart
+            "endpoint": os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1",
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def cached_analysis(test_run_diff, current_run_details, prompt_version, models, analyze, print_cached=False):
+    """
+    Return the stored analysis for an identical diff, prompt version, model(s),
+    prompt size settings (`LLM_TOKEN_BUDGET`, `LLM_CHUNK_SIZE`) and OpenAI endpoint,
+    or call `analyze()` and store its result. Pass `print_cached=True` when
+    `analyze()` streams its output, so a cache hit is printed the same way.
+    """
+    cache = get_analysis_cache()
+    if cache is None:
+        return analyze()
+
+    key = analysis_cache_key(test_run_diff, current_run_details, prompt_version, models)
+    stored = cache.get(key)
+    if stored is not None:
+        print("🧠 Using cached analysis (pass --no-llm-cache to refresh)...")
+        analysis = stored.decode("utf-8")
+        if print_cached:
+            print(f"\n{analysis}")
+        return analysis
+
+    analysis = analyze()
+    cache.set(key, analysis.encode("utf-8"), ttl=MAX_AGE_DAYS * 86400)
+    return analysis
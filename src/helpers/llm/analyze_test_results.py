@@ -1,20 +1,27 @@
 
+import os
 from openai import OpenAI
+from helpers.llm.serialize_test_run_diff import serialize_test_run_diff
+from helpers.data.cluster_failures import cluster_failures
 
-def analyze_test_results(test_run_diff, current_run_details, openai_api_key):
-    print("🧠 Analyzing data with OpenAI...")
-    client = OpenAI(api_key=openai_api_key)
-    
-    prompt = f"""Analyze {test_run_diff} and provide a summary of the changes.
-        Only show sections that have data, do not comment about empty sections.
+# OPENAI_BASE_URL is honoured by the client, so a local OpenAI-compatible stub works too
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# Bump whenever the prompt wording changes, so cached analyses from the old prompt are ignored
+PROMPT_VERSION = 3
+SECTIONS = ("New Failures", "Still Failing", "New Tests", "Resolved")
+
+PREAMBLE = """Only show sections that have data, do not comment about empty sections.
         Do not format the output as a markdown code block.
-        Do not insert bullet points or any other formatting unless directed to do so.
+        Do not insert bullet points or any other formatting unless directed to do so."""
 
-        🔍 Patterns (only show this section if there are 4+ New Failures)
+PATTERNS_INSTRUCTIONS = """🔍 Patterns (only show this section if there are 4+ New Failures)
         Summarize any similar or repetitive errors?. Do any particular features seem to have multiple failures?
-        If there is more than one observation, separate them on a new line with a bullet point.
+        If there is more than one observation, separate them on a new line with a bullet point."""
 
-        🔴 New Failures ({len(test_run_diff["New Failures"])}):
+
+def section_instructions(section, count, author):
+    if section == "New Failures":
+        return f"""🔴 New Failures ({count}):
         Include very short error context if available, but omit stack traces or redundant info, summarize it in 35 characters or less.
         Do not include author.
         Do not include comment about consecutive failures/attempts.
@@ -23,35 +30,119 @@ def analyze_test_results(test_run_diff, current_run_details, openai_api_key):
         Example:
         [e2e-browser] Feature > Test name — Timeout waiting for 'Preview'
         [e2e-electron] Feature > Test name — Timeout waiting for visibility
-        [e2e-window] Feature > Test name — Interrupted run
-
-        🫠 Still Failing ({len(test_run_diff["Still Failing"])}):
+        [e2e-window] Feature > Test name — Interrupted run"""
+    if section == "Still Failing":
+        return f"""🫠 Still Failing ({count}):
         Include note "Yx since Z".
         Do not include error analysis or observations.
         If test title is more than 50 characters, truncate at 50 and add append "...
         Example:
         [e2e-win] Feature > Test name (2x since shorthand commitSHA)
-        [e2e-browser] Feature > Test name (3x since shorthand commitSHA)
-
-        ⭐️ New Tests ({len(test_run_diff["New Tests"])}):
+        [e2e-browser] Feature > Test name (3x since shorthand commitSHA)"""
+    if section == "New Tests":
+        return f"""⭐️ New Tests ({count}):
         If test title is more than 50 characters, truncate at 50 and add append "...
         No extra commentary, but include author name.
         Example:
-        [groupId] Feature > Test name (by {current_run_details.get("meta", {}).get("commit", {}).get("authorName")})
-        [e2e-electron] Login > Should be able to login (added by Marie Idleman)
-
-        ✅ Resolved ({len(test_run_diff["Resolved"])}):
+        [groupId] Feature > Test name (by {author})
+        [e2e-electron] Login > Should be able to login (added by Marie Idleman)"""
+    return f"""✅ Resolved ({count}):
         If test title is more than 90 characters, truncate at 90 characters. (Resolved section only)
         No extra commentary.
         Example:
-        [e2e-electron] Feature > Test name
+        [e2e-electron] Feature > Test name"""
+
+
+def build_prompt(serialized_diff, test_run_diff, current_run_details, sections=SECTIONS, patterns=True):
+    author = current_run_details.get("meta", {}).get("commit", {}).get("authorName")
+    instructions = [PATTERNS_INSTRUCTIONS] if patterns else []
+    instructions += [section_instructions(section, len(test_run_diff.get(section, [])), author) for section in sections]
+    joined_instructions = "\n\n        ".join(instructions)
+
+    return f"""Analyze the test run diff below and provide a summary of the changes.
+        In the diff, each test is one line: [groupId] test title. New Failures lines end with an error id
+        whose text is listed under "Errors:". Still Failing lines end with "Yx since commitSHA".
+
+        {serialized_diff}
+
+        {PREAMBLE}
+
+        {joined_instructions}
         """
-    
+
+
+def complete(client, prompt, model=MODEL, stream=False):
+    """
+    Run one chat completion and return its text. With `stream=True` the tokens
+    are printed to the terminal as they arrive, so the first line shows up
+    without waiting for the whole reply.
+    """
     response = client.chat.completions.create(
-        model="gpt-4o",
+        model=model,
         messages=[{"role": "user", "content": prompt}],
         tools=[],
         tool_choice="auto",
+        stream=stream,
     )
-    
-    return response.choices[0].message.content.strip()
+    if not stream:
+        return response.choices[0].message.content.strip()
+
+    parts = []
+    for chunk in response:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            print(delta, end="", flush=True)
+            parts.append(delta)
+    print()
+    return "".join(parts).strip()
+
+
+def analyze_test_results(test_run_diff, current_run_details, openai_api_key, token_budget=None, stream=False):
+    print("🧠 Analyzing data with OpenAI...")
+    client = OpenAI(api_key=openai_api_key)
+
+    serialized_diff, stats = serialize_test_run_diff(test_run_diff, current_run_details, token_budget)
+    dropped = f", {stats['dropped']} tests over budget omitted" if stats["dropped"] else ""
+    print(f"    ↪ prompt data: {stats['tokens_before']} → {stats['tokens_after']} tokens{dropped}")
+
+    prompt = build_prompt(serialized_diff, test_run_diff, current_run_details)
+    if stream:
+        print()
+    return complete(client, prompt, stream=stream)
+
+
+def describe_clusters(clusters, limit=20):
+    """One line per error cluster: count, representative message, specs and groups."""
+    lines = []
+    for cluster in clusters[:limit]:
+        specs = ", ".join(spec for spec, _ in cluster["specs"].most_common(3))
+        groups = ", ".join(f"{group} ×{count}" for group, count in cluster["groups"].most_common(3))
+        lines.append(f"{cluster['count']}× {cluster['representative']} (specs: {specs}; groups: {groups})")
+    if len(clusters) > limit:
+        lines.append(f"... and {len(clusters) - limit} more distinct errors")
+    return lines
+
+
+def patterns_prompt(clusters):
+    lines = "\n        ".join(describe_clusters(clusters))
+    return f"""These are the new failures of a test run, clustered by similar error message:
+
+        {lines}
+
+        {PATTERNS_INSTRUCTIONS}
+        Output only this section, starting with its header.
+        """
+
+
+def analyze_patterns(test_run_diff, current_run_details, openai_api_key, stream=False):
+    """
+    Ask the LLM to phrase the Patterns section. Only the error clusters'
+    representatives are sent, not every failure.
+    """
+    print("🧠 Looking for patterns with OpenAI...")
+    client = OpenAI(api_key=openai_api_key)
+
+    prompt = patterns_prompt(cluster_failures(test_run_diff.get("New Failures", [])))
+    if stream:
+        print()
+    return complete(client, prompt, stream=stream)
@@ -0,0 +1,70 @@
+import os
+import sys
+import concurrent.futures
+from openai import OpenAI
+from helpers.data.cluster_failures import cluster_failures
+from helpers.llm.analyze_test_results import SECTIONS, build_prompt, complete, patterns_prompt, section_instructions
+from helpers.llm.serialize_test_run_diff import serialize_test_run_diff
+
+CHUNK_SIZE = int(os.getenv("LLM_CHUNK_SIZE", "40"))
+MAX_PARALLEL = int(os.getenv("LLM_MAX_PARALLEL", "4"))
+MERGE_MODEL = os.getenv("LLM_MERGE_MODEL", "gpt-4o-mini")
+# Diffs with more tests than this are summarized with map-reduce automatically
+MAP_REDUCE_THRESHOLD = int(os.getenv("LLM_MAP_REDUCE_THRESHOLD", "150"))
+
+
+def should_map_reduce(test_run_diff):
+    if "--map-reduce" in sys.argv:
+        return True
+    return sum(len(test_run_diff.get(section, [])) for section in SECTIONS) > MAP_REDUCE_THRESHOLD
+
+
+def summarize_chunk(client, section, tests, current_run_details):
+    chunk_diff = {section: tests}
+    serialized_diff, _ = serialize_test_run_diff(chunk_diff, current_run_details)
+    prompt = build_prompt(serialized_diff, chunk_diff, current_run_details, sections=(section,), patterns=False)
+    prompt += "\n        Output only the test lines, without the section header."
+    return complete(client, prompt)
+
+
+def summarize_patterns(client, new_failures):
+    return complete(client, patterns_prompt(cluster_failures(new_failures)), model=MERGE_MODEL)
+
+
+def analyze_test_results_map_reduce(test_run_diff, current_run_details, openai_api_key):
+    """
+    Summarize a large diff in chunks. Each section is split into chunks of
+    `LLM_CHUNK_SIZE` tests, the chunks are summarized concurrently (at most
+    `LLM_MAX_PARALLEL` calls in flight), and a merge pass stitches the section
+    lines back together under the usual headers. The only cross-chunk question,
+    Patterns, gets one small call over the New Failures' error clusters.
+    """
+    print("🧠 Analyzing data with OpenAI (map-reduce)...")
+    client = OpenAI(api_key=openai_api_key)
+    author = current_run_details.get("meta", {}).get("commit", {}).get("authorName")
+
+    chunks = []
+    for section in SECTIONS:
+        tests = test_run_diff.get(section, [])
+        for start in range(0, len(tests), CHUNK_SIZE):
+            chunks.append((section, tests[start:start + CHUNK_SIZE]))
+    print(f"    ↪ {len(chunks)} chunks, up to {MAX_PARALLEL} in parallel")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL) as executor:
+        futures = [executor.submit(summarize_chunk, client, section, tests, current_run_details) for section, tests in chunks]
+        summaries = [future.result() for future in futures]
+
+    # Merge: chunks come back in submission order, so lines stay grouped per section
+    lines_by_section = {section: [] for section in SECTIONS}
+    for (section, _), summary in zip(chunks, summaries):
+        lines_by_section[section].extend(line.strip() for line in summary.splitlines() if line.strip())
+
+    output = []
+    if len(test_run_diff.get("New Failures", [])) >= 4:
+        output.append(summarize_patterns(client, test_run_diff["New Failures"]))
+    for section in SECTIONS:
+        if lines_by_section[section]:
+            header = section_instructions(section, len(test_run_diff.get(section, [])), author).splitlines()[0]
+            output.append("\n".join([header] + lines_by_section[section]))
+
+    return "\n\n".join(output)
@@ -0,0 +1,125 @@
+import os
+import re
+from currents.test_record import to_plain
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to a characters-per-token estimate
+    tiktoken = None
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", "6000"))
+ERROR_CHARS = 160
+# Same limits the prompt asks for, applied up front so we don't pay for the rest
+TITLE_LIMITS = {"New Failures": 50, "Still Failing": 50, "New Tests": 50, "Resolved": 90}
+SECTIONS = ("New Failures", "Still Failing", "New Tests", "Resolved")
+
+ANSI_ESCAPES = re.compile(r"\x1b\[[0-9;]*m")
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.encoding_for_model("gpt-4o")
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def truncate_title(name, limit, ellipsis=True):
+    name = str(name or "")
+    return name if len(name) <= limit else name[:limit] + ("..." if ellipsis else "")
+
+
+def error_summary(test):
+    """First line of the last failed attempt's error message, without colour codes."""
+    for attempt in reversed(test.get("attempts") or []):
+        message = ((attempt or {}).get("error") or {}).get("message")
+        message = ANSI_ESCAPES.sub("", str(message or "")).strip()
+        if message:
+            return message.splitlines()[0][:ERROR_CHARS]
+    return None
+
+
+def serialize_test_run_diff(test_run_diff, current_run_details, token_budget=None):
+    """
+    Reduce a test run diff to the fields the analysis prompt actually uses.
+
+    Each test becomes one line (`[groupId] title` plus an error reference or
+    streak note), similar errors are clustered and only each cluster's
+    representative is listed, once, and referenced by id. Entries are then
+    dropped from the largest sections until the text fits the budget.
+
+    Returns:
+        tuple: (serialized text, stats dict with `tokens_before`, `tokens_after` and `dropped`).
+    """
+    # Imported here: cluster_failures uses error_summary from this module
+    from helpers.data.cluster_failures import cluster_failures
+
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    # Similar errors share one id, and only each cluster's representative is sent
+    errors = {}
+    error_ids = {}
+    for cluster in cluster_failures(test_run_diff.get("New Failures", [])):
+        error_id = errors.setdefault(cluster["representative"], f"E{len(errors) + 1}")
+        error_ids.update((id(test), error_id) for test in cluster["tests"])
+    lines_by_section = {}
+
+    for section in SECTIONS:
+        lines = []
+        for test in test_run_diff.get(section, []):
+            title = truncate_title(test.get("name"), TITLE_LIMITS[section], ellipsis=section != "Resolved")
+            line = f"[{test.get('groupId')}] {title}"
+            if section == "New Failures":
+                error_id = error_ids.get(id(test))
+                if error_id:
+                    line += f" | {error_id}"
+            elif section == "Still Failing":
+                history = test.get("history") or {}
+                sha = (history.get("lastPassCommitSHA") or "unknown")[:7]
+                line += f" | {history.get('consecutiveFailures', 1)}x since {sha}"
+            lines.append(line)
+        lines_by_section[section] = lines
+
+    author = (current_run_details.get("meta") or {}).get("commit", {}).get("authorName")
+    header_lines = [f"author: {author}"] if author else []
+
+    def render(dropped):
+        out = list(header_lines)
+        referenced = set()
+        for section in SECTIONS:
+            lines = lines_by_section[section]
+            if not lines and not dropped.get(section):
+                continue
+            out.append(f"{section} ({len(test_run_diff.get(section, []))}):")
+            out.extend(lines)
+            if dropped.get(section):
+                out.append(f"... and {dropped[section]} more")
+            referenced.update(re.findall(r"\| (E\d+)$", "\n".join(lines), flags=re.MULTILINE))
+        error_lines = [f"{error_id}: {error}" for error, error_id in errors.items() if error_id in referenced]
+        if error_lines:
+            out.extend(["Errors:"] + error_lines)
+        return "\n".join(out)
+
+    dropped = {}
+    text = render(dropped)
+    tokens_after = count_tokens(text)
+    while tokens_after > token_budget:
+        largest = max(SECTIONS, key=lambda section: len(lines_by_section[section]))
+        if not lines_by_section[largest]:
+            break
+        # Drop roughly the overshoot's share of lines in one go rather than one at a time
+        overshoot = tokens_after / token_budget
+        cut = max(1, int(len(lines_by_section[largest]) * (1 - 1 / overshoot)))
+        del lines_by_section[largest][-cut:]
+        dropped[largest] = dropped.get(largest, 0) + cut
+        text = render(dropped)
+        tokens_after = count_tokens(text)
+
+    stats = {
+        "tokens_before": count_tokens(str(to_plain(test_run_diff))),
+        "tokens_after": tokens_after,
+        "dropped": sum(dropped.values()),
+    }
+    return text, stats
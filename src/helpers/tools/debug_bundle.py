@@ -0,0 +1,147 @@
+import atexit
+import gzip
+import io
+import os
+import queue
+import threading
+import time
+from currents.test_record import dump_json_bytes, load_json_bytes
+from helpers.tools.rotate_output_dir import current_output_dir
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; gzip is always available
+    zstandard = None
+
+BUNDLE_NAME = "debug.ndjson"
+
+
+def to_json_value(value):
+    # Compact records (e.g. TestRecord) know how to turn themselves back into dicts
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+def encode_record(name, data):
+    """One NDJSON line: `{"name": ..., "data": ...}`."""
+    return dump_json_bytes({"name": name, "data": data}, default=to_json_value) + b"\n"
+
+
+def open_compressed(path, mode):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install zstandard to read it")
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")))
+    return gzip.open(path, mode, compresslevel=6) if "w" in mode else gzip.open(path, mode)
+
+
+class DebugBundleWriter:
+    """
+    Writes debug records to one compressed NDJSON bundle on a background thread.
+
+    `write` only queues the record, so encoding and compression stay off the
+    pipeline's threads. Records are encoded when the writer gets to them, so
+    data must not be changed after it's handed over. The bundle is zstd when
+    zstandard is installed, gzip otherwise.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, BUNDLE_NAME + (".zst" if zstandard is not None else ".gz"))
+        self.records = 0
+        self.bytes = 0
+        self.errors = 0
+        self.flush_seconds = None
+        self._queue = queue.Queue()
+        self._file = open_compressed(self.path, "wb")
+        self._thread = threading.Thread(target=self._run, name="debug-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, name, data):
+        self._queue.put((name, data))
+
+    def close(self):
+        """Wait for queued records to be written and finish the bundle."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                line = encode_record(*item)
+                self._file.write(line)
+                self.records += 1
+                self.bytes += len(line)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error writing debug record {item[0]}: {e}")
+
+
+_writer = None
+_lock = threading.Lock()
+
+
+def open_debug_bundle(output_dir):
+    """Start this run's bundle in `output_dir`, closing any bundle still open."""
+    global _writer
+    close_debug_bundle()
+    with _lock:
+        _writer = DebugBundleWriter(output_dir)
+        return _writer
+
+
+def get_debug_bundle():
+    """The open bundle, started in the current output directory on first use."""
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = DebugBundleWriter(current_output_dir())
+        return _writer
+
+
+def close_debug_bundle():
+    """Flush and close the open bundle. Returns its writer (for stats), or None."""
+    global _writer
+    with _lock:
+        writer, _writer = _writer, None
+    if writer is None:
+        return None
+    started_at = time.perf_counter()
+    writer.close()
+    writer.flush_seconds = time.perf_counter() - started_at
+    return writer
+
+
+atexit.register(close_debug_bundle)
+
+
+def read_debug_bundle(path):
+    """Yield `(name, data)` for every record of a bundle, in the order written."""
+    with open_compressed(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                record = load_json_bytes(line)
+                yield record["name"], record["data"]
+
+
+def load_debug_bundle(path):
+    """All records of a bundle as `name -> data` (a repeated name keeps its last record)."""
+    return dict(read_debug_bundle(path))
+
+
+def find_debug_bundle(path):
+    """Resolve a run directory (e.g. `output/latest`) or a bundle path to the bundle file."""
+    if os.path.isdir(path):
+        for extension in (".zst", ".gz"):
+            candidate = os.path.join(path, BUNDLE_NAME + extension)
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(f"No debug bundle in {path}")
+    return path
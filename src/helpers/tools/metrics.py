@@ -0,0 +1,184 @@
+import json
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+# Path segments that look like ids (contain a digit, 6+ chars) are collapsed so endpoints aggregate
+ID_SEGMENT = re.compile(r"^(?=.*\d)[\w.-]{6,}$")
+
+
+def endpoint_name(url):
+    """`https://api.currents.dev/v1/instances/abc123def` -> `/v1/instances/{id}`."""
+    segments = urlparse(url).path.split("/")
+    return "/".join("{id}" if ID_SEGMENT.match(segment) else segment for segment in segments) or "/"
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Process-wide counters for HTTP calls and pipeline stages.
+
+    Requests, retries, 429s, bytes, cache hits and hedged requests are counted
+    per endpoint; latencies go into a cumulative histogram per endpoint, and
+    each endpoint's circuit breaker state is kept. Stage wall times are
+    recorded by name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.statuses = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.rate_limited = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.cache_hits = defaultdict(int)
+        self.hedged = defaultdict(int)
+        self.hedge_wins = defaultdict(int)
+        self.breaker_states = {}
+        self.latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.latency_sum = defaultdict(float)
+        self.stage_seconds = {}
+
+    def record_request(self, url, status_code, seconds, size=None):
+        endpoint = endpoint_name(url)
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.statuses[(endpoint, status_code)] += 1
+            self.latency_sum[endpoint] += seconds
+            buckets = self.latency_buckets[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            if size:
+                self.bytes[endpoint] += size
+            if status_code == 429:
+                self.rate_limited[endpoint] += 1
+
+    def record_retry(self, url):
+        with self._lock:
+            self.retries[endpoint_name(url)] += 1
+
+    def record_bytes(self, url, size):
+        with self._lock:
+            self.bytes[endpoint_name(url)] += size
+
+    def record_cache_hit(self, url):
+        with self._lock:
+            self.cache_hits[endpoint_name(url)] += 1
+
+    def record_hedge(self, endpoint, won):
+        with self._lock:
+            self.hedged[endpoint] += 1
+            if won:
+                self.hedge_wins[endpoint] += 1
+
+    def record_breaker_state(self, endpoint, state):
+        with self._lock:
+            self.breaker_states[endpoint] = state
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            self.stage_seconds[name] = seconds
+
+    def latency_quantile(self, endpoint, quantile):
+        """Upper bound of the histogram bucket holding the given quantile (None past the last finite bucket)."""
+        buckets = self.latency_buckets.get(endpoint)
+        if not buckets or not buckets[-1]:
+            return None
+        target = quantile * buckets[-1]
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            if count >= target:
+                return bound if bound != float("inf") else None
+        return None
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = sorted(set(self.requests) | set(self.cache_hits) | set(self.breaker_states))
+            return {
+                "endpoints": {
+                    endpoint: {
+                        "requests": self.requests.get(endpoint, 0),
+                        "statuses": {str(status): count for (name, status), count in self.statuses.items() if name == endpoint},
+                        "retries": self.retries.get(endpoint, 0),
+                        "rateLimited": self.rate_limited.get(endpoint, 0),
+                        "bytes": self.bytes.get(endpoint, 0),
+                        "cacheHits": self.cache_hits.get(endpoint, 0),
+                        "hedged": self.hedged.get(endpoint, 0),
+                        "hedgeWins": self.hedge_wins.get(endpoint, 0),
+                        "breaker": self.breaker_states.get(endpoint, "closed"),
+                        "latencySeconds": {
+                            "sum": round(self.latency_sum.get(endpoint, 0.0), 4),
+                            "p50": self.latency_quantile(endpoint, 0.5),
+                            "p95": self.latency_quantile(endpoint, 0.95),
+                            "buckets": dict(zip(map(str, LATENCY_BUCKETS), self.latency_buckets[endpoint])) if endpoint in self.latency_buckets else {},
+                        },
+                    }
+                    for endpoint in endpoints
+                },
+                "stages": {name: round(seconds, 4) for name, seconds in self.stage_seconds.items()},
+                "totals": {
+                    "requests": sum(self.requests.values()),
+                    "retries": sum(self.retries.values()),
+                    "rateLimited": sum(self.rate_limited.values()),
+                    "bytes": sum(self.bytes.values()),
+                    "cacheHits": sum(self.cache_hits.values()),
+                    "hedged": sum(self.hedged.values()),
+                    "hedgeWins": sum(self.hedge_wins.values()),
+                    "openBreakers": sum(1 for state in self.breaker_states.values() if state != "closed"),
+                },
+            }
+
+    def to_prometheus(self, prefix="currents"):
+        """Render the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+
+            def counter(name, help_text, values):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{prefix}_{name}{{endpoint="{label(endpoint)}"}} {value}')
+
+            counter("requests_total", "HTTP requests sent, per endpoint.", self.requests)
+            counter("retries_total", "Request retries, per endpoint.", self.retries)
+            counter("rate_limited_total", "429 responses, per endpoint.", self.rate_limited)
+            counter("bytes_total", "Response bytes received, per endpoint.", self.bytes)
+            counter("cache_hits_total", "Requests served from the response cache, per endpoint.", self.cache_hits)
+            counter("hedged_total", "Hedged (duplicated) slow requests, per endpoint.", self.hedged)
+            counter("hedge_wins_total", "Hedged requests where the second copy finished first, per endpoint.", self.hedge_wins)
+
+            lines.append(f"# HELP {prefix}_breaker_open Whether the endpoint's circuit breaker is open (1) or half-open (0.5).")
+            lines.append(f"# TYPE {prefix}_breaker_open gauge")
+            for endpoint, state in sorted(self.breaker_states.items()):
+                value = {"open": 1, "half-open": 0.5}.get(state, 0)
+                lines.append(f'{prefix}_breaker_open{{endpoint="{label(endpoint)}"}} {value}')
+
+            lines.append(f"# HELP {prefix}_request_seconds Request latency, per endpoint.")
+            lines.append(f"# TYPE {prefix}_request_seconds histogram")
+            for endpoint, buckets in sorted(self.latency_buckets.items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'{prefix}_request_seconds_bucket{{endpoint="{label(endpoint)}",le="{le}"}} {count}')
+                lines.append(f'{prefix}_request_seconds_sum{{endpoint="{label(endpoint)}"}} {self.latency_sum[endpoint]:.6f}')
+                lines.append(f'{prefix}_request_seconds_count{{endpoint="{label(endpoint)}"}} {buckets[-1]}')
+
+            lines.append(f"# HELP {prefix}_stage_seconds Wall time of each pipeline stage.")
+            lines.append(f"# TYPE {prefix}_stage_seconds gauge")
+            for name, seconds in self.stage_seconds.items():
+                lines.append(f'{prefix}_stage_seconds{{stage="{label(name)}"}} {seconds:.6f}')
+            return "\n".join(lines) + "\n"
+
+    def write(self, json_path, prometheus_path):
+        with open(json_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        with open(prometheus_path, "w") as f:
+            f.write(self.to_prometheus())
+
+
+metrics = Metrics()
@@ -0,0 +1,61 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from helpers.tools.rotate_output_dir import current_output_dir
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional; cProfile is always available
+    Profiler = None
+
+
+def run_profiled(func, output_dir=None):
+    """
+    Run `func` under a profiler and save the capture to `output_dir` (by default,
+    the directory of the run `func` rotated to).
+
+    With pyinstrument installed, writes `profile.html` and prints the call tree
+    (pyinstrument samples the main thread, where stages show up as waits).
+    Otherwise cProfile writes `profile.pstats` and the top functions by
+    cumulative time are printed. Before Python 3.12, cProfile only sees the
+    thread that enabled it, so every new thread gets its own profile and they're
+    merged at the end.
+    """
+    if Profiler is not None:
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            return func()
+        finally:
+            profiler.stop()
+            path = os.path.join(output_dir or current_output_dir(), "profile.html")
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+            print(profiler.output_text(unicode=True, color=False, show_all=False))
+            print(f"🔬 Profile written to {path}")
+
+    profiles = [cProfile.Profile()]
+    if sys.version_info < (3, 12):
+        def profile_thread(*args):
+            profile = cProfile.Profile()
+            profiles.append(profile)
+            profile.enable()
+        threading.setprofile(profile_thread)
+
+    profiles[0].enable()
+    try:
+        return func()
+    finally:
+        profiles[0].disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        path = os.path.join(output_dir or current_output_dir(), "profile.pstats")
+        stats.dump_stats(path)
+        stats.stream = sys.stdout
+        stats.sort_stats("cumulative").print_stats(25)
+        print(f"🔬 Profile written to {path} (open with `python -m pstats {path}`)")
@@ -0,0 +1,51 @@
+import os
+import re
+import shutil
+import time
+
+OUTPUT_DIR = "output"
+# Run directories kept under `output/runs`; older ones are removed when a new run starts
+KEEP_RUNS = int(os.getenv("OUTPUT_KEEP_RUNS", "10"))
+
+_current_dir = OUTPUT_DIR
+
+
+def rotate_output_dir(run_id, keep=KEEP_RUNS):
+    """
+    Create a fresh `output/runs/<timestamp>-<runId>` directory for this run and
+    point `output/latest` at it. Only the oldest run directories past `keep` are
+    deleted, each with one `rmtree`, so earlier runs' output stays around.
+
+    Returns:
+        str: The new run directory.
+    """
+    runs_dir = os.path.join(OUTPUT_DIR, "runs")
+    os.makedirs(runs_dir, exist_ok=True)
+    safe_run_id = re.sub(r"[^\w.-]", "_", str(run_id))
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_run_id}"
+    run_dir = os.path.join(runs_dir, name)
+    os.makedirs(run_dir, exist_ok=True)
+
+    previous = sorted(entry for entry in os.listdir(runs_dir) if entry != name)
+    for old in previous[:max(len(previous) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(runs_dir, old), ignore_errors=True)
+
+    latest = os.path.join(OUTPUT_DIR, "latest")
+    try:
+        if os.path.islink(latest) or os.path.isfile(latest):
+            os.unlink(latest)
+        os.symlink(os.path.join("runs", name), latest)
+    except OSError:
+        # No symlinks (e.g. Windows without developer mode): record the name instead
+        with open(os.path.join(OUTPUT_DIR, "LATEST"), "w") as f:
+            f.write(name + "\n")
+
+    global _current_dir
+    _current_dir = run_dir
+    return run_dir
+
+
+def current_output_dir():
+    """The directory of the run in progress (`output` until `rotate_output_dir` is called)."""
+    os.makedirs(_current_dir, exist_ok=True)
+    return _current_dir
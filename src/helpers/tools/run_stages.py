@@ -0,0 +1,74 @@
+import concurrent.futures
+import contextvars
+import time
+
+
+def run_stages(stages):
+    """
+    Run pipeline stages as a dependency graph, each stage as soon as its dependencies are done.
+
+    Stages run on their own threads rather than the shared HTTP pool, since most
+    of them block on work queued there.
+
+    Args:
+        stages (dict): `name -> (func, [dependency names])`. Each `func` is called
+            with the dict of results finished so far.
+
+    Returns:
+        tuple: (results dict, timings dict of `name -> (start, end)` in seconds
+        since the first stage started).
+    """
+    results = {}
+    timings = {}
+    started_at = time.perf_counter()
+    running = {}
+
+    def timed(name, func):
+        start = time.perf_counter() - started_at
+        try:
+            return func(results)
+        finally:
+            timings[name] = (start, time.perf_counter() - started_at)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stages) or 1) as executor:
+        while len(results) < len(stages):
+            for name, (func, dependencies) in stages.items():
+                if name not in results and name not in running and all(dep in results for dep in dependencies):
+                    # Stages see the caller's context, e.g. its active Currents client
+                    running[name] = executor.submit(contextvars.copy_context().run, timed, name, func)
+            if not running:
+                missing = [name for name in stages if name not in results]
+                raise ValueError(f"Stages with unmet dependencies: {', '.join(missing)}")
+
+            done, _ = concurrent.futures.wait(running.values(), return_when=concurrent.futures.FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future in done:
+                    del running[name]
+                    # Re-raises the stage's exception; stages already running finish on shutdown
+                    results[name] = future.result()
+
+    return results, timings
+
+
+def critical_path(stages, timings):
+    """
+    The chain of stages that determined the total wall time: start from the stage
+    that finished last and keep following the dependency that finished last.
+    """
+    if not timings:
+        return []
+    name = max(timings, key=lambda stage: timings[stage][1])
+    path = [name]
+    while stages[name][1]:
+        name = max(stages[name][1], key=lambda stage: timings[stage][1])
+        path.append(name)
+    return list(reversed(path))
+
+
+def print_stage_timings(stages, timings):
+    print("\n⏱️ Stages:")
+    for name, (start, end) in sorted(timings.items(), key=lambda item: item[1][0]):
+        print(f"    ↪ {name}: {start:.2f}s → {end:.2f}s ({end - start:.2f}s)")
+    path = critical_path(stages, timings)
+    total = timings[path[-1]][1] if path else 0
+    print("    ↪ critical path: " + " → ".join(f"{name} ({timings[name][1] - timings[name][0]:.2f}s)" for name in path) + f" = {total:.2f}s")
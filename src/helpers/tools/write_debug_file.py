@@ -1,5 +1,5 @@
-import json
+from helpers.tools.debug_bundle import get_debug_bundle
 
 def write_debug_file(filename, data):
-    with open(f"output/{filename}", "w") as f:
-        json.dump(data, f, indent=2, default=str)
+    """Queue `data` for the run's debug bundle under `filename`; see `DebugBundleWriter`."""
+    get_debug_bundle().write(filename, data)
@@ -1,25 +1,40 @@
 
 import os
+import sys
 from dotenv import load_dotenv
-from helpers.data.get_run_test_results import get_run_data
-from helpers.data.get_test_data import get_run_test_results
-from helpers.data.enrich_test_data import enrich_test_data
-from helpers.data.compare_test_results import compare_test_results
-from helpers.tools.reset_output_dir import reset_output_dir
+
+# Before the imports below: the rate limiter, HTTP pool, breakers and hedger read their settings when imported
+load_dotenv()
+
+from helpers.data.get_run_test_results import get_current_run_details, get_previous_run_details
+from helpers.data.get_test_data import RunDiffPipeline, prepare_run_test_diff
+from helpers.tools.run_stages import run_stages, print_stage_timings
+from helpers.tools.metrics import metrics
+from helpers.tools.profile_run import run_profiled
+from helpers.tools.rotate_output_dir import rotate_output_dir
+from helpers.tools.debug_bundle import open_debug_bundle, close_debug_bundle
+from helpers.data.test_warehouse import close_test_warehouse, set_warehouse_enabled
 from helpers.tools.write_debug_file import write_debug_file
 from helpers.tools.is_debug_mode import is_debug_mode
-from helpers.llm.analyze_test_results import analyze_test_results
+from openai import OpenAIError
+from helpers.data.render_test_run_diff import render_test_run_diff, render_partial_notice
+from helpers.llm.analyze_test_results import analyze_test_results, analyze_patterns, MODEL, PROMPT_VERSION
+from helpers.llm.analyze_test_results_map_reduce import analyze_test_results_map_reduce, should_map_reduce, MERGE_MODEL
+from helpers.llm.analysis_cache import cached_analysis
+from currents.response_cache import get_cache_stats
+from currents.rate_limiter import rate_limiter
+from currents.circuit_breaker import breaker_stats
+from currents.hedged_request import instance_hedger
 
 # Configuration
 def load_config():
-    load_dotenv()
     return {
         "currents_api_key": os.getenv("CURRENTS_API_KEY"),
         "currents_project_id": os.getenv("CURRENTS_PROJECT_ID"),
         "openai_api_key": os.getenv("OPENAI_API_KEY"),
         # toggle scenario
         # "currents_current_run_id": 'd2d5a69185f2ca69'  # new tests
-        "currents_current_run_id": '8d295e14f8b6168c'  # 12 resolved, 2 still failing
+        "currents_current_run_id": os.getenv("CURRENTS_RUN_ID") or '8d295e14f8b6168c'  # 12 resolved, 2 still failing
         # "currents_current_run_id": 'c38c1f8033d08338'  # passing" scenario
         # "currents_current_run_id": 'b5b38a6560f9218d'  # persistent failure 6x
         # "currents_current_run_id": '324ac53e1fc63ec9'  # new failure
@@ -27,37 +42,144 @@ def load_config():
         # "currents_current_run_id": 'd2d5a69185f2ca69'  # new test
     }
 
+def get_matrix_runs():
+    """`--matrix-runs N` builds the flakiness matrix over the latest N runs (off by default)."""
+    if "--matrix-runs" in sys.argv:
+        position = sys.argv.index("--matrix-runs") + 1
+        value, usage = (sys.argv[position] if position < len(sys.argv) else None), "--matrix-runs N"
+    else:
+        value, usage = os.getenv("MATRIX_RUNS", "0"), "MATRIX_RUNS=N"
+    try:
+        matrix_runs = int(value)
+    except (TypeError, ValueError):
+        matrix_runs = -1
+    if matrix_runs < 0:
+        got = "no value" if value is None else repr(value)
+        raise SystemExit(f"Usage: {usage}, where N is the number of latest runs in the flakiness matrix (got {got})")
+    return matrix_runs
+
+def report(test_run_diff, current_run_details, config, missing_counts=None, skipped_instances=0):
+    partial_notice = render_partial_notice(missing_counts, skipped_instances)
+    if partial_notice:
+        print("\n" + partial_notice)
+    use_llm = "--no-llm" not in sys.argv and config["openai_api_key"]
+    if use_llm and "--llm-summary" in sys.argv:
+        # Full LLM report (in concurrent chunks for large diffs), reusing the
+        # stored analysis when this exact diff has been analyzed before
+        if should_map_reduce(test_run_diff):
+            analysis = cached_analysis(
+                test_run_diff, current_run_details, PROMPT_VERSION, ["map-reduce", MODEL, MERGE_MODEL],
+                lambda: analyze_test_results_map_reduce(test_run_diff, current_run_details, config["openai_api_key"]),
+            )
+            print("\n\n", analysis)
+        else:
+            cached_analysis(
+                test_run_diff, current_run_details, PROMPT_VERSION, [MODEL],
+                lambda: analyze_test_results(test_run_diff, current_run_details, config["openai_api_key"], stream=True),
+                print_cached=True,
+            )
+        return
+
+    # The report, Patterns included, is rendered locally so it doesn't wait on the LLM.
+    # `--llm-patterns` has the LLM phrase Patterns from the error clusters instead.
+    llm_patterns = use_llm and "--llm-patterns" in sys.argv
+    print("\n\n" + (render_test_run_diff(test_run_diff, current_run_details, patterns=not llm_patterns) or "No changes."))
+    if llm_patterns and len(test_run_diff.get("New Failures", [])) >= 4:
+        try:
+            cached_analysis(
+                {"New Failures": test_run_diff["New Failures"]}, current_run_details, PROMPT_VERSION, ["patterns", MODEL],
+                lambda: analyze_patterns(test_run_diff, current_run_details, config["openai_api_key"], stream=True),
+                print_cached=True,
+            )
+        except OpenAIError as err:
+            print(f"\n⚠️ Skipping Patterns, OpenAI is unavailable: {err}")
+
+def pipeline_stages(config, debug_mode):
+    """
+    The analysis as a dependency graph: the previous run is resolved while the
+    current run's details and instances download.
+    """
+    current_run_id = config["currents_current_run_id"]
+    changed_only = "--changed-only" in sys.argv
+    matrix_runs = get_matrix_runs()
+
+    stages = {
+        "current run": (lambda results: get_current_run_details(current_run_id, debug_mode), []),
+        "previous run": (lambda results: get_previous_run_details(current_run_id, debug_mode), []),
+    }
+
+    if changed_only or matrix_runs > 2:
+        # These modes plan their downloads from both runs at once
+        stages["plan"] = (lambda results: prepare_run_test_diff(
+            current_run_id,
+            results["previous run"]["runId"],
+            results["current run"],
+            debug_mode,
+            matrix_runs=matrix_runs,
+        ), ["current run", "previous run"])
+        stages["tests"] = (lambda results: results["plan"][0].fetch(results["plan"][1], changed_only=changed_only), ["plan"])
+        stages["diff"] = (lambda results: results["plan"][0].finish(), ["tests"])
+    else:
+        stages["pipeline"] = (lambda results: RunDiffPipeline(results["current run"], debug_mode), ["current run"])
+        stages["current tests"] = (lambda results: results["pipeline"].fetch([current_run_id], 0), ["pipeline"])
+        stages["previous tests"] = (lambda results: results["pipeline"].fetch([results["previous run"]["runId"]], 1), ["pipeline", "previous run"])
+        stages["diff"] = (lambda results: results["pipeline"].finish(), ["current tests", "previous tests"])
+
+    def report_stage(results):
+        if debug_mode:
+            write_debug_file("test_run_diff.json", results["diff"])
+        pipeline = results["pipeline"] if "pipeline" in results else results["plan"][0]
+        report(results["diff"], results["current run"], config, pipeline.missing_counts(), pipeline.skipped_instances)
+
+    stages["report"] = (report_stage, ["diff", "current run"])
+    return stages
+
 # Main function
 def main():
     debug_mode = is_debug_mode()
-    reset_output_dir()
-    
+    set_warehouse_enabled("--no-warehouse" not in sys.argv)
+
     # Load configuration
     config = load_config()
-    
-    # Get run data
-    current_run_details, previous_run_details = get_run_data(
-        config["currents_current_run_id"], 
-        debug_mode
-    )
-    
-    # Get run test results
-    current_run_tests, previous_run_tests = get_run_test_results(
-        config["currents_current_run_id"], 
-        previous_run_details["runId"], 
-        debug_mode
-    )
-    
-    # Compare and enrich test results
-    test_run_diff = compare_test_results(previous_run_tests, current_run_tests)
-    test_run_diff = enrich_test_data(test_run_diff, current_run_details, debug_mode)
-    
+    output_dir = rotate_output_dir(config["currents_current_run_id"])
     if debug_mode:
-        write_debug_file("test_run_diff.json", test_run_diff)
-    
-    # Analyze results with OpenAI
-    analysis = analyze_test_results(test_run_diff, current_run_details, config["openai_api_key"])
-    print("\n\n", analysis)
+        open_debug_bundle(output_dir)
+
+    print("📦 Get test runs...")
+    stages = pipeline_stages(config, debug_mode)
+    _, timings = run_stages(stages)
+    print_stage_timings(stages, timings)
+    for name, (start, end) in timings.items():
+        metrics.record_stage(name, end - start)
+
+    cache_stats = get_cache_stats()
+    print(f"\n💾 Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+
+    limiter_stats = rate_limiter.stats()
+    print(f"🚦 Rate limiter: {limiter_stats['rate']} req/s, {limiter_stats['total_requests']} requests, peak queue depth {limiter_stats['peak_queue_depth']}")
+
+    hedge_stats = instance_hedger.stats()
+    print(f"🛡️ Hedging: {hedge_stats['hedged']} of {hedge_stats['calls']} instance downloads hedged, {hedge_stats['wins']} won by the hedge")
+    for endpoint, stats in breaker_stats().items():
+        if stats["trips"] or stats["state"] != "closed":
+            print(f"⚡ Circuit breaker {endpoint}: {stats['state']}, tripped {stats['trips']}x, {stats['rejected']} requests failed fast")
+
+    totals = metrics.to_dict()["totals"]
+    metrics.write(os.path.join(output_dir, "metrics.json"), os.path.join(output_dir, "metrics.prom"))
+    print(f"📊 Metrics: {totals['requests']} requests, {totals['retries']} retries, {totals['rateLimited']} rate limited, "
+          f"{totals['bytes'] / 1e6:.1f} MB, {totals['cacheHits']} cache hits ({output_dir}/metrics.json, metrics.prom)")
+
+    warehouse = close_test_warehouse()
+    if warehouse:
+        print(f"🗄️ Test warehouse: {warehouse.stats['results']} results, {warehouse.stats['history']} history records added to {warehouse.root}")
+
+    bundle = close_debug_bundle()
+    if bundle:
+        print(f"🐞 Debug bundle: {bundle.path}, {bundle.records} records ({bundle.bytes / 1e6:.1f} MB uncompressed, "
+              f"{os.path.getsize(bundle.path) / 1e6:.1f} MB written), waited {bundle.flush_seconds:.2f}s for the writer")
 
 if __name__ == "__main__":
-    main()
+    if "--profile" in sys.argv:
+        run_profiled(main)
+    else:
+        main()
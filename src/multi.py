@@ -0,0 +1,144 @@
+"""
+Analyze several projects and branches at once, under one shared API budget.
+
+    python src/multi.py --target ZOs5z2:main --target ZOs5z2:release/2025.04 --target other
+    python src/multi.py --target ZOs5z2:main@8d295e14f8b6168c
+    python src/multi.py --targets targets.json
+
+A target is `project[:branch][@runId]`; the branch defaults to `main` and the
+run to the newest `merge` run on that branch. A targets file holds a JSON list
+of `{"project": ..., "branch": ..., "run": ..., "tags": [...]}` objects.
+
+Every target runs with its own `CurrentsClient`, but all of them share one
+connection pool, rate limiter, response cache and run index per project. The
+HTTP pool serves the targets' queued requests round-robin, so a large project
+can't starve the others. One report per target and a `summary.json` go to the
+run's output directory.
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import re
+import time
+from dataclasses import replace
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from currents.client import CurrentsClient, use_client
+from currents.get_project_runs import get_latest_run, get_previous_run
+from currents.get_run_details import get_run_details
+from currents.http_engine import pool_stats
+from currents.rate_limiter import rate_limiter
+from helpers.data.get_test_data import prepare_run_test_diff
+from helpers.data.render_test_run_diff import render_test_run_diff, render_partial_notice
+from helpers.data.test_warehouse import set_warehouse_enabled
+from helpers.tools.rotate_output_dir import rotate_output_dir
+
+
+def parse_target(spec):
+    """`project[:branch][@runId]` -> target dict."""
+    match = re.fullmatch(r"([^:@]+)(?::([^@]+))?(?:@(.+))?", spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid target {spec!r}, expected project[:branch][@runId]")
+    project, branch, run = match.groups()
+    return {"project": project, "branch": branch or "main", "run": run}
+
+
+def analyze_target(client, target, out_dir):
+    """Analyze one target's run against its previous run, as `client`. Returns the target's summary."""
+    started_at = time.perf_counter()
+    with use_client(client):
+        run = get_run_details(target["run"]) if target.get("run") else get_latest_run()
+        if "error" in run:
+            raise ValueError(run["error"])
+        previous_run = get_previous_run(run["runId"])
+        if "error" in previous_run:
+            raise ValueError(previous_run["error"])
+
+        pipeline, run_ids = prepare_run_test_diff(run["runId"], previous_run["runId"], run)
+        pipeline.fetch(run_ids)
+        test_run_diff = pipeline.finish()
+        missing = pipeline.missing_counts()
+        skipped = pipeline.skipped_instances
+
+    report = render_test_run_diff(test_run_diff, run) or "No changes."
+    if missing or skipped:
+        report = render_partial_notice(missing, skipped) + "\n\n" + report
+    path = os.path.join(out_dir, re.sub(r"[^\w.-]", "_", f"{client.label}-{run['runId']}") + ".txt")
+    with open(path, "w") as f:
+        f.write(f"{client.label}: {run['runId']} vs {previous_run['runId']}\n\n{report}\n")
+
+    return {
+        "target": client.label,
+        "runId": run["runId"],
+        "previousRunId": previous_run["runId"],
+        "counts": {section: len(tests) for section, tests in test_run_diff.items()},
+        "partial": missing or None,
+        "skippedInstances": skipped,
+        "seconds": round(time.perf_counter() - started_at, 2),
+        "report": path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", type=parse_target, default=[], help="project[:branch][@runId] (repeatable)")
+    parser.add_argument("--targets", help="JSON file with a list of targets")
+    parser.add_argument("--tag", action="append", help="Tag the runs must carry (repeatable, default: merge)")
+    parser.add_argument("--no-warehouse", action="store_true", help="Don't add the downloaded results to the local test warehouse (same as TEST_WAREHOUSE=off)")
+    args = parser.parse_args()
+    set_warehouse_enabled(not args.no_warehouse)
+
+    targets = list(args.target)
+    if args.targets:
+        with open(args.targets) as f:
+            targets += json.load(f)
+    if not targets:
+        raise SystemExit("No targets given; pass --target or --targets.")
+
+    base = CurrentsClient.from_env()
+    clients = []
+    labels = collections.Counter()
+    for target in targets:
+        client = base.for_target(target["project"], target.get("branch") or "main", target.get("tags") or args.tag, target.get("run"))
+        # The label keys the pool's per-target queues and counts, so repeated targets get one each
+        labels[client.label] += 1
+        if labels[client.label] > 1:
+            client = replace(client, name=f"{client.label}#{labels[client.label]}")
+        clients.append(client)
+    out_dir = rotate_output_dir("multi")
+    print(f"📦 Analyzing {len(targets)} targets: {', '.join(client.label for client in clients)}")
+
+    started_at = time.perf_counter()
+    summaries = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {executor.submit(analyze_target, client, target, out_dir): client for client, target in zip(clients, targets)}
+        for future in concurrent.futures.as_completed(futures):
+            client = futures[future]
+            try:
+                summary = future.result()
+                print(f"📝 {summary['target']}: {summary['runId']} in {summary['seconds']}s, "
+                      + ", ".join(f"{count} {section}" for section, count in summary["counts"].items()))
+            except Exception as e:
+                summary = {"target": client.label, "error": str(e)}
+                print(f"⚠️ {client.label}: {e}")
+            summaries.append(summary)
+
+    served = pool_stats()["served"]
+    for summary in summaries:
+        summary["poolCalls"] = served.get(summary["target"], 0)
+    elapsed = time.perf_counter() - started_at
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump({"seconds": round(elapsed, 2), "targets": summaries}, f, indent=2)
+
+    limiter_stats = rate_limiter.stats()
+    print(f"\n⏱️ {len(targets)} targets in {elapsed:.2f}s, {limiter_stats['total_requests']} requests at {limiter_stats['rate']} req/s")
+    print("🚦 Pool calls per target: " + ", ".join(f"{summary['target']} {summary['poolCalls']}" for summary in summaries))
+    print(f"📁 Reports in {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
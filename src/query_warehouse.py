@@ -0,0 +1,77 @@
+"""
+Ask the local test warehouse about trends, without calling the Currents API.
+
+    python src/query_warehouse.py failures --by spec --days 7          # failure counts per spec
+    python src/query_warehouse.py failures --by group --since 2025-04-01 --until 2025-04-15
+    python src/query_warehouse.py growing --days 14                    # failure rates trending up
+    python src/query_warehouse.py first-bad --spec tests/login.spec.ts --test "Login > rejects a bad password"
+
+The warehouse is filled by every analysis (`main`, `watch`, `backfill`, `multi`):
+each downloaded test result and history record is stored under
+`.cache/warehouse/<projectId>/<run date>.sqlite`, unless they're run with
+`--no-warehouse` or `TEST_WAREHOUSE=off`. Queries default to the project in
+`CURRENTS_PROJECT_ID`, and read the warehouse even when recording is off.
+"""
+import argparse
+import json
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from helpers.data.test_warehouse import GROUP_BY, get_test_warehouse
+
+
+def print_table(rows, columns):
+    if not rows:
+        print("No matching records.")
+        return
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", choices=("failures", "growing", "first-bad"))
+    parser.add_argument("--by", choices=tuple(GROUP_BY), help="Group failures by spec, group or test (default: spec for failures, test for growing)")
+    parser.add_argument("--days", type=int, help="Window ending at --until (default: 7 for failures, 14 for growing)")
+    parser.add_argument("--since", help="Window start (ISO date or timestamp)")
+    parser.add_argument("--until", help="Window end (ISO date or timestamp, default: now)")
+    parser.add_argument("--branch", help="Only runs on this branch")
+    parser.add_argument("--project", help="Project id (default: CURRENTS_PROJECT_ID)")
+    parser.add_argument("--spec", help="Spec file of the test (first-bad)")
+    parser.add_argument("--test", help="Full test name (first-bad)")
+    parser.add_argument("--group", help="Only this group (first-bad)")
+    parser.add_argument("--limit", type=int, default=20, help="Rows to show (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Print the rows as JSON")
+    args = parser.parse_args()
+
+    warehouse = get_test_warehouse(readonly=True)
+    if args.until and len(args.until) == 10:
+        args.until += "T23:59:59Z"
+
+    started_at = time.perf_counter()
+    if args.query == "failures":
+        rows = warehouse.failure_counts(args.since, args.until, args.by or "spec", args.branch, args.project, args.days or 7)[:args.limit]
+        columns = ("failures", "executions", "runs", "key")
+    elif args.query == "growing":
+        rows = warehouse.growing_failures(args.since, args.until, args.by or "test", args.branch, args.project, args.days or 14, args.limit)
+        columns = ("slope", "firstRate", "lastRate", "failures", "executions", "days", "key")
+    else:
+        if not args.spec or not args.test:
+            parser.error("first-bad needs --spec and --test")
+        rows = warehouse.first_bad_commits(args.spec, args.test, args.group, args.branch, args.project)
+        columns = ("groupId", "firstBadCommit", "author", "firstFailedAt", "failingRecords", "lastGoodCommit", "lastPassedAt")
+    elapsed = time.perf_counter() - started_at
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows, columns)
+        print(f"\n⏱️ {len(rows)} rows in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
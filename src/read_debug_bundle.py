@@ -0,0 +1,46 @@
+"""
+Read a run's debug bundle back, e.g. to replay a report offline.
+
+    python src/read_debug_bundle.py output/latest                          # list records
+    python src/read_debug_bundle.py output/latest --show test_run_diff.json
+    python src/read_debug_bundle.py output/latest --extract output/debug   # one JSON file per record
+    python src/read_debug_bundle.py output/latest --report                 # re-render the report
+
+The path is a run directory under `output/runs` (or `output/latest`) or the
+bundle file itself.
+"""
+import argparse
+import json
+import os
+from helpers.data.render_test_run_diff import render_test_run_diff
+from helpers.tools.debug_bundle import find_debug_bundle, load_debug_bundle, read_debug_bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.path.join("output", "latest"))
+    parser.add_argument("--show", help="Print one record as JSON")
+    parser.add_argument("--extract", help="Write every record to this directory as pretty-printed JSON")
+    parser.add_argument("--report", action="store_true", help="Render the report from the recorded diff and run details")
+    args = parser.parse_args()
+
+    path = find_debug_bundle(args.path)
+    if args.show:
+        print(json.dumps(load_debug_bundle(path)[args.show], indent=2))
+    elif args.extract:
+        os.makedirs(args.extract, exist_ok=True)
+        for name, data in read_debug_bundle(path):
+            with open(os.path.join(args.extract, name), "w") as f:
+                json.dump(data, f, indent=2)
+        print(f"Extracted {path} to {args.extract}")
+    elif args.report:
+        records = load_debug_bundle(path)
+        print(render_test_run_diff(records["test_run_diff.json"], records.get("current_run_details.json", {})) or "No changes.")
+    else:
+        for name, data in read_debug_bundle(path):
+            size = len(data) if isinstance(data, (list, dict)) else 1
+            print(f"{name} ({size} {'items' if isinstance(data, list) else 'keys' if isinstance(data, dict) else 'value'})")
+
+
+if __name__ == "__main__":
+    main()
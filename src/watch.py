@@ -0,0 +1,282 @@
+"""
+Watch for new runs and analyze each one as it finishes.
+
+    python src/watch.py --interval 60 --port 8780 --sink file:output/watch
+
+The process stays up, so the run index, response cache, HTTP connection pool
+and history lookups stay warm between runs. New runs are found by polling the
+run index (which only fetches runs newer than the ones it knows) or pushed with
+
+    curl -X POST localhost:8780/webhook -d '{"runId": "8d295e14f8b6168c"}'
+
+`GET /health` returns JSON with the queue depth and lag; `GET /metrics`
+returns the same numbers as Prometheus gauges, plus the HTTP metrics.
+
+Sinks: `stdout` (default), `file:<dir>` (one report per run) or an http(s)
+URL that receives each result as a JSON POST.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from currents.get_project_runs import get_previous_run
+from currents.get_run_details import get_run_details
+from currents.http_engine import get_session
+from currents.response_cache import is_finished
+from currents.run_index import get_run_index
+from helpers.data.get_test_data import prepare_run_test_diff
+from helpers.data.render_test_run_diff import render_test_run_diff, render_partial_notice
+from helpers.data.test_warehouse import set_warehouse_enabled
+from helpers.tools.metrics import metrics
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def make_sink(spec):
+    """Return a callable that delivers one analysis result, based on the `--sink` spec."""
+    if spec == "stdout":
+        return lambda result: print(f"\n📝 {result['runId']}\n{result['report']}\n")
+
+    if spec.startswith("file:"):
+        directory = spec[len("file:"):]
+        os.makedirs(directory, exist_ok=True)
+
+        def write(result):
+            with open(os.path.join(directory, f"{result['runId']}.json"), "w") as f:
+                json.dump(result, f, indent=2)
+        return write
+
+    if spec.startswith(("http://", "https://")):
+        def post(result):
+            get_session().post(spec, json=result, timeout=10).raise_for_status()
+        return post
+
+    raise ValueError(f"Unknown sink: {spec}")
+
+
+class RunLookupError(Exception):
+    """A run couldn't be loaded from Currents; `status_code` is the API's, if it answered."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Watcher:
+    """
+    Queue of runs to analyze, fed by polling and webhooks and drained by one worker.
+
+    Runs that are still in progress wait in `pending` and are re-checked on every
+    poll. Lag is measured from when a run finished (or was first seen, if the API
+    gives no end time) to when its analysis was delivered.
+    """
+
+    def __init__(self, sink, tags, branches, interval):
+        self.sink = sink
+        self.tags = tags
+        self.branches = branches
+        self.interval = interval
+        self.index = get_run_index()
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.seen = set()
+        self.enqueued_at = {}
+        self.processed = 0
+        self.failed = 0
+        self.last_lag = None
+        self.last_poll = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Runs that existed before we started are history, not work
+        self.index.sync()
+        self.seen.update(self.index.runs)
+        threading.Thread(target=self._poll_loop, daemon=True).start()
+        threading.Thread(target=self._work_loop, daemon=True).start()
+
+    def submit(self, run_id, run=None):
+        """Queue a run once it has finished. Returns False if it was already handled."""
+        with self._lock:
+            if run_id in self.enqueued_at:
+                return False
+            self.seen.add(run_id)
+        run = run or get_run_details(run_id)
+        if "error" in run:
+            raise RunLookupError(run["error"], run.get("status_code"))
+        with self._lock:
+            if run_id in self.enqueued_at:
+                return False
+            if not is_finished(run):
+                self.pending[run_id] = run
+                return True
+            self.pending.pop(run_id, None)
+            self.enqueued_at[run_id] = time.time()
+            self.queue.put(run)
+            return True
+
+    def poll(self):
+        self.index.sync()
+        new_runs = [run for run_id, run in list(self.index.runs.items()) if run_id not in self.seen]
+        for run in new_runs:
+            self.seen.add(run["runId"])
+            if self.index.matches(run, self.tags, self.branches):
+                self.submit(run["runId"], run)
+        # Re-check unfinished runs with fresh details (the response cache only keeps these briefly)
+        for run_id in list(self.pending):
+            self.submit(run_id, get_run_details(run_id))
+        self.last_poll = time.time()
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            waiting = [now - self.enqueued_at[run["runId"]] for run in list(self.queue.queue)]
+        return {
+            "status": "ok",
+            "queue_depth": self.queue.qsize(),
+            "pending_runs": len(self.pending),
+            "oldest_queued_seconds": round(max(waiting), 1) if waiting else 0,
+            "last_lag_seconds": round(self.last_lag, 1) if self.last_lag is not None else None,
+            "seconds_since_poll": round(now - self.last_poll, 1) if self.last_poll else None,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    def analyze(self, run):
+        previous_run = get_previous_run(run["runId"], tags=self.tags, branches=self.branches)
+        if "error" in previous_run:
+            raise ValueError(previous_run["error"])
+        pipeline, run_ids = prepare_run_test_diff(run["runId"], previous_run["runId"], run)
+        pipeline.fetch(run_ids)
+        test_run_diff = pipeline.finish()
+        missing = pipeline.missing_counts()
+        skipped = pipeline.skipped_instances
+        report = render_test_run_diff(test_run_diff, run) or "No changes."
+        return {
+            "runId": run["runId"],
+            "previousRunId": previous_run["runId"],
+            "createdAt": run.get("createdAt"),
+            "counts": {section: len(tests) for section, tests in test_run_diff.items()},
+            "partial": missing or None,
+            "skippedInstances": skipped,
+            "report": (render_partial_notice(missing, skipped) + "\n\n" + report) if missing or skipped else report,
+        }
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ Poll failed: {e}")
+
+    def _work_loop(self):
+        while True:
+            run = self.queue.get()
+            try:
+                self.sink(self.analyze(run))
+                self.processed += 1
+                finished_at = parse_timestamp(run.get("completedAt") or run.get("endedAt")) or self.enqueued_at[run["runId"]]
+                self.last_lag = time.time() - finished_at
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ Analysis of {run.get('runId')} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+
+def make_handler(watcher):
+    class WatchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = watcher.status()
+            if self.path == "/health":
+                self.reply(200, json.dumps(status), "application/json")
+            elif self.path == "/metrics":
+                lines = [
+                    f"currents_watch_{name} {0 if value is None else value}"
+                    for name, value in status.items() if name != "status"
+                ]
+                self.reply(200, "\n".join(lines) + "\n" + metrics.to_prometheus(), "text/plain; version=0.0.4")
+            else:
+                self.reply(404, json.dumps({"error": "not found"}), "application/json")
+
+        def do_POST(self):
+            if self.path != "/webhook":
+                self.reply(404, json.dumps({"error": "not found"}), "application/json")
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("the body must be a JSON object")
+                data = body.get("data")
+                run_id = body.get("runId") or (data.get("runId") if isinstance(data, dict) else None)
+                if not run_id or not isinstance(run_id, str):
+                    raise ValueError("runId is required")
+                queued = watcher.submit(run_id)
+            except ValueError as e:
+                self.reply(400, json.dumps({"error": str(e)}), "application/json")
+                return
+            except RunLookupError as e:
+                # An unknown run is the caller's mistake; anything else means Currents couldn't be reached
+                code = e.status_code if e.status_code and 400 <= e.status_code < 500 else 502
+                self.reply(code, json.dumps({"error": str(e)}), "application/json")
+                return
+            except requests.RequestException as e:
+                self.reply(502, json.dumps({"error": str(e)}), "application/json")
+                return
+            except Exception as e:
+                self.reply(500, json.dumps({"error": str(e)}), "application/json")
+                return
+            self.reply(202, json.dumps({"runId": run_id, "queued": queued}), "application/json")
+
+        def reply(self, code, body, content_type):
+            payload = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return WatchHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=float(os.getenv("WATCH_INTERVAL", "60")), help="Seconds between polls")
+    parser.add_argument("--port", type=int, default=int(os.getenv("WATCH_PORT", "8780")), help="Port for /webhook, /health and /metrics")
+    parser.add_argument("--sink", default=os.getenv("WATCH_SINK", "stdout"), help="stdout, file:<dir> or an http(s) URL")
+    parser.add_argument("--branch", action="append", help="Branch to watch (repeatable, default: main)")
+    parser.add_argument("--tag", action="append", help="Tag the runs must carry (repeatable, default: merge)")
+    parser.add_argument("--no-warehouse", action="store_true", help="Don't add the downloaded results to the local test warehouse (same as TEST_WAREHOUSE=off)")
+    args = parser.parse_args()
+    set_warehouse_enabled(not args.no_warehouse)
+
+    watcher = Watcher(make_sink(args.sink), args.tag or ["merge"], args.branch or ["main", "refs/heads/main"], args.interval)
+    watcher.start()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(watcher))
+    print(f"👀 Watching for new runs every {args.interval:g}s, listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()